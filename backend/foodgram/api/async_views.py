@@ -0,0 +1,79 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.urls import URLPattern
+
+from foodgram.middleware import record_queries
+
+
+def call_view(view, request, *args, **kwargs):
+    """Выполняет синхронный view и рендерит ответ в текущем потоке."""
+    with record_queries(getattr(request, 'query_recorder', None)):
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        if response.streaming:
+            # ASGIHandler Django 3.2 перебирает streaming_content прямо в
+            # цикле событий, поэтому генератор (например, вёрстка PDF
+            # списка покупок) выполняется здесь, в потоке view.
+            response.streaming_content = list(response.streaming_content)
+    return response
+
+
+def run_view(view, request, *args, **kwargs):
+    """Выполняет view в рабочем потоке пула."""
+    try:
+        return call_view(view, request, *args, **kwargs)
+    finally:
+        # Соединения рабочих потоков не закрываются сигналом
+        # request_finished, поэтому закрываем их сами.
+        connections.close_all()
+
+
+def async_view(view, actions):
+    """Асинхронная обёртка над view DRF для ASGI.
+
+    Для методов, которые ведут на перечисленные действия, тело запроса и
+    отправка ответа медленному клиенту обслуживаются циклом событий, а
+    сам view выполняется в пуле потоков и не держит воркер сервера.
+    Остальные методы маршрута (запись) выполняются, как обычный
+    синхронный view под ASGI, в общем потоке thread_sensitive.
+    """
+    methods = {
+        method.upper() for method, action in view.actions.items()
+        if action in actions
+    }
+    if 'GET' in methods and 'head' not in view.actions:
+        methods.add('HEAD')
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in methods:
+            return await sync_to_async(run_view, thread_sensitive=False)(
+                view, request, *args, **kwargs
+            )
+        return await sync_to_async(call_view, thread_sensitive=True)(
+            view, request, *args, **kwargs
+        )
+    return wrapper
+
+
+def async_patterns(patterns, actions):
+    """Заменяет view маршрутов с действиями из actions на обёртки.
+
+    actions - словарь {viewset: имена действий}.
+    """
+    wrapped = []
+    for pattern in patterns:
+        view = pattern.callback
+        names = actions.get(getattr(view, 'cls', None), ())
+        if set(getattr(view, 'actions', {}).values()) & set(names):
+            pattern = URLPattern(
+                pattern.pattern,
+                async_view(view, names),
+                pattern.default_args,
+                pattern.name,
+            )
+        wrapped.append(pattern)
+    return wrapped
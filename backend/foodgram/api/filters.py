@@ -1,38 +1,44 @@
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Ingredient, Recipe, Tag
-
-
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+from recipes.catalog import tag_catalog
+from recipes.models import Recipe, RecipeTag
+from recipes.search import search_recipes
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=lambda: [(slug, slug) for slug in tag_catalog.slugs()],
+        method='filter_tags',
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search',)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(pk__in=RecipeTag.objects.filter(
+            tag_id__in=tag_catalog.ids_by_slugs(value)
+        ).values('recipe_id'))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorite_recipe__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(recipe_in_cart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
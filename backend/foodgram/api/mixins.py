@@ -1,8 +1,22 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
 from rest_framework.mixins import (CreateModelMixin, DestroyModelMixin,
                                    ListModelMixin, RetrieveModelMixin,
                                    UpdateModelMixin)
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from foodgram.db_router import use_primary
+from foodgram.versions import get_version
+
+RESPONSE_CACHE_KEY = 'foodgram:response:{}'
+
 
 class GetListCreateDestroyUpdateViewSet(
     RetrieveModelMixin,
@@ -37,3 +51,171 @@ class ListViewSet(
     GenericViewSet
 ):
     pass
+
+
+def parse_fields(value):
+    """Разбирает 'id,author.id,author.username' во вложенный словарь.
+
+    Пустой словарь у поля означает, что оно нужно целиком.
+    """
+    fields = {}
+    for path in value.split(','):
+        node = fields
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return fields
+
+
+class SparseFieldsMixin:
+    """Поля ответа по параметрам fields= и omit=.
+
+    Для действий из card_actions параметр representation=card выбирает
+    набор card_fields, если fields не указан. Разобранные поля передаются
+    сериализатору в контексте, а get_queryset может спросить
+    field_requested(), чтобы не читать ненужное.
+    """
+    sparse_actions = ('list', 'retrieve')
+    card_actions = ('list',)
+    card_fields = ''
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = ({}, {})
+            if self.action in self.sparse_actions:
+                params = self.request.query_params
+                fields = params.get('fields', '')
+                if not fields and self.action in self.card_actions and (
+                    params.get('representation') == 'card'
+                ):
+                    fields = self.card_fields
+                self._sparse_fields = (
+                    parse_fields(fields), parse_fields(params.get('omit', ''))
+                )
+        return self._sparse_fields
+
+    def field_requested(self, name):
+        fields, omit = self.get_sparse_fields()
+        if fields and name not in fields:
+            return False
+        return not (name in omit and not omit[name])
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['omit'] = self.get_sparse_fields()
+        return context
+
+
+class AnonymousCacheMixin:
+    """Кэширует list и retrieve для анонимных пользователей.
+
+    Ключ строится из хоста, действия, аргументов URL, нормализованных
+    параметров запроса и версий наборов данных из cache_versions.
+    Сигналы поднимают версии, и старые записи просто перестают читаться.
+    """
+    cache_versions = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+            if value != ''
+        )
+        versions = [get_version(name) for name in self.cache_versions]
+        raw = '|'.join((
+            request.get_host(),
+            self.basename,
+            self.action,
+            urlencode(sorted(self.kwargs.items())),
+            urlencode(params),
+            repr(versions),
+        ))
+        return RESPONSE_CACHE_KEY.format(
+            hashlib.md5(raw.encode()).hexdigest()
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        # Запись в кэш живёт до смены версии, поэтому читается
+        # с основной базы, а не с возможно отстающей реплики.
+        with use_primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+        return response
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 Not Modified на повторные GET до сериализации.
+
+    Валидаторы возвращает get_validators: по умолчанию это версии из
+    cache_versions, ETag строится из них, пути с параметрами, формата
+    ответа и пользователя, Last-Modified - по самой свежей версии.
+    Если время изменения None, Last-Modified не отдаётся, а
+    If-Modified-Since не учитывается: проверка только по ETag.
+    """
+    conditional_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_validators(self, request):
+        """Возвращает (состояние для ETag, время изменения или None)."""
+        versions = [get_version(name) for name in self.cache_versions]
+        return versions, max(versions)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        validators = None
+        if self.action in self.conditional_actions:
+            validators = self.get_validators(request)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        state, last_modified = validators
+        raw = '|'.join((
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            str(request.user.pk),
+            repr(state),
+        ))
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        if last_modified is not None:
+            last_modified = int(last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+        return response
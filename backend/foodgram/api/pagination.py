@@ -1,5 +1,209 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram.db import estimate_count
+from recipes.feed import feed_page, feed_sources
 
 
 class PageLimitPagination(PageNumberPagination):
+    """Постраничная пагинация с опциональным режимом курсора.
+
+    Если в запросе есть параметр cursor, страница выбирается по ключу
+    view.cursor_fields (keyset) без OFFSET и без COUNT(*). Общее число
+    объектов возвращается только по запросу: count=exact или count=approx.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    cursor_fields = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_cursor_mode(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.fields = getattr(view, 'cursor_fields', self.cursor_fields)
+        self.count = self.get_count(queryset, request)
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.parse_position(queryset.model, position)
+            queryset = queryset.filter(
+                self.get_keyset_filter(position, reverse)
+            )
+        ordering = self.fields
+        if reverse:
+            ordering = [self.invert(field) for field in ordering]
+        results = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+        first = last = None
+        if results:
+            first = self.get_position(results[0])
+            last = self.get_position(results[-1])
+        self.set_positions(first, last, has_more, position, reverse)
+        return results
+
+    def set_positions(self, first, last, has_more, position, reverse):
+        """Позиции соседних страниц по первой и последней строке."""
+        self.next_position = self.previous_position = None
+        if last is not None and (has_more or reverse):
+            self.next_position = last
+        if first is not None and (
+                has_more if reverse else position is not None):
+            self.previous_position = first
+
+    def is_cursor_mode(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.encode_cursor(self.next_position, False)
+        response['previous'] = self.encode_cursor(
+            self.previous_position,
+            True
+        )
+        response['results'] = data
+        return Response(response)
+
+    def get_count(self, queryset, request):
+        count = request.query_params.get(self.count_query_param)
+        if count == 'exact':
+            return queryset.count()
+        if count == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def get_position(self, instance):
+        position = []
+        for field in self.fields:
+            value = getattr(instance, field.lstrip('-'))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def get_keyset_filter(self, position, reverse):
+        keyset_filter = Q()
+        equal = {}
+        for field, value in zip(self.fields, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            keyset_filter |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return keyset_filter
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position, reverse = data['p'], bool(data['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+                len(position) != len(self.fields)):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def parse_position(self, model, position):
+        """Приводит значения курсора к типам полей сортировки."""
+        parsed = []
+        for field, value in zip(self.fields, position):
+            try:
+                value = model._meta.get_field(field.lstrip('-')).to_python(
+                    value
+                )
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            parsed.append(value)
+        return parsed
+
+    def encode_cursor(self, position, reverse):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': reverse}).encode()
+        ).decode()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+
+class KeysetPagination(PageLimitPagination):
+    """Пагинация только по курсору, без номеров страниц."""
+
+    def is_cursor_mode(self, request):
+        return True
+
+
+class FeedPagination(KeysetPagination):
+    """Курсорная пагинация ленты подписок.
+
+    Страница выбирается по (pub_date, id рецепта) из FeedEntry и рецептов
+    популярных авторов (recipes.feed.feed_page), после чего из queryset
+    читаются по pk только рецепты этой страницы.
+    """
+    cursor_fields = ('-pub_date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = True
+        self.request = request
+        self.fields = self.cursor_fields
+        self.count = self.get_feed_count(request)
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.parse_position(queryset.model, position)
+        rows = feed_page(request.user, position, reverse, page_size + 1)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+        first = last = None
+        if rows:
+            first = self.get_row_position(rows[0])
+            last = self.get_row_position(rows[-1])
+        self.set_positions(first, last, has_more, position, reverse)
+        recipes = queryset.in_bulk([recipe_id for _, recipe_id in rows])
+        return [
+            recipes[recipe_id] for _, recipe_id in rows
+            if recipe_id in recipes
+        ]
+
+    @staticmethod
+    def get_row_position(row):
+        pub_date, recipe_id = row
+        return [pub_date.isoformat(), recipe_id]
+
+    def get_feed_count(self, request):
+        count = request.query_params.get(self.count_query_param)
+        if count not in ('exact', 'approx'):
+            return None
+        return sum(
+            self.get_count(queryset, request)
+            for queryset, _ in feed_sources(request.user)
+        )
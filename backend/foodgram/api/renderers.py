@@ -0,0 +1,79 @@
+import math
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Как и DRF, экранируем разделители строк: иначе ответ не будет
+# корректным JavaScript.
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+def has_non_finite(data, default):
+    """Есть ли в данных NaN или бесконечность.
+
+    orjson пишет такие числа как null, поэтому проверка нужна, только
+    если null есть в результате.
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif value is not None and not isinstance(value, (str, int)):
+            try:
+                stack.append(default(value))
+            except TypeError:
+                pass
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson, если он установлен.
+
+    Без orjson, при запрошенных отступах, UNICODE_JSON = False или
+    STRICT_JSON = False работает стандартный рендерер DRF на json из
+    стандартной библиотеки. Типы, которые orjson не знает (ленивые
+    строки, Decimal, QuerySet), и даты кодируются тем же JSONEncoder,
+    что и у DRF. Как и DRF, рендерер отказывается кодировать NaN и
+    бесконечность (ValueError) и экранирует U+2028 и U+2029.
+    """
+
+    options = 0
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or not api_settings.UNICODE_JSON
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        if data is None:
+            return b''
+        default = JSONEncoder().default
+        content = orjson.dumps(data, default=default, option=self.options)
+        if b'null' in content and has_non_finite(data, default):
+            raise ValueError(
+                'Out of range float values are not JSON compliant'
+            )
+        for separator, escaped in LINE_SEPARATORS:
+            content = content.replace(separator, escaped)
+        return content
@@ -1,41 +1,103 @@
 import base64
-import imghdr
+import io
 import uuid
+import warnings
 
 import six
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from PIL import Image, UnidentifiedImageError
 from rest_framework import serializers
 
+from recipes import shopping_list
+from recipes.catalog import tag_catalog
+from recipes.images import IMAGE_VARIANTS, normalize_image, schedule_variants
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             RecipeTag, ShoppingCart, Tag)
 from users.serializers import UserGetSerializer
 
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'too_large': 'Image size must not exceed {max_size} bytes.',
+        'too_big': 'Image sides must not exceed {max_dimension} pixels.',
+    }
+    formats = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
     def to_internal_value(self, data):
         if isinstance(data, six.string_types):
             if 'data:' in data and ';base64,' in data:
                 header, data = data.split(';base64,')
+            if len(data) * 3 // 4 > settings.MAX_UPLOAD_IMAGE_SIZE:
+                self.fail('too_large', max_size=settings.MAX_UPLOAD_IMAGE_SIZE)
             try:
                 decoded_file = base64.b64decode(data)
-            except TypeError:
+                # Pillow проверяет размер по заголовку: предупреждение
+                # о слишком большом изображении превращаем в ошибку.
+                with warnings.catch_warnings():
+                    warnings.simplefilter(
+                        'error', Image.DecompressionBombWarning
+                    )
+                    image = Image.open(io.BytesIO(decoded_file))
+            except (TypeError, ValueError, UnidentifiedImageError):
+                self.fail('invalid_image')
+            except (
+                Image.DecompressionBombError, Image.DecompressionBombWarning
+            ):
+                self.fail(
+                    'too_big',
+                    max_dimension=settings.MAX_UPLOAD_IMAGE_DIMENSION
+                )
+            if image.format not in self.formats:
+                self.fail('invalid_image')
+            if max(image.size) > settings.MAX_UPLOAD_IMAGE_DIMENSION:
+                self.fail(
+                    'too_big',
+                    max_dimension=settings.MAX_UPLOAD_IMAGE_DIMENSION
+                )
+            try:
+                content = normalize_image(image)
+            except (OSError, Image.DecompressionBombError):
                 self.fail('invalid_image')
             file_name = str(uuid.uuid4())[:12]
-            file_extension = self.get_file_extension(file_name, decoded_file)
-
-            complete_file_name = "%s.%s" % (file_name, file_extension, )
+            complete_file_name = "%s.%s" % (
+                file_name, self.formats[image.format],
+            )
 
-            data = ContentFile(decoded_file, name=complete_file_name)
+            data = ContentFile(content, name=complete_file_name)
 
         return super(Base64ImageField, self).to_internal_value(data)
 
-    def get_file_extension(self, file_name, decoded_file):
 
-        extension = imghdr.what(file_name, decoded_file)
-        extension = "jpg" if extension == "jpeg" else extension
+class CatalogRelatedField(serializers.RelatedField):
+    """Связь, которая ищет объект в справочнике процесса, а не в базе."""
+    default_error_messages = {
+        'does_not_exist': 'Invalid pk "{pk_value}" - object does not exist.',
+        'incorrect_type': 'Incorrect type. Expected pk value, received '
+                          '{data_type}.',
+    }
+
+    def __init__(self, catalog, **kwargs):
+        self.catalog = catalog
+        kwargs.setdefault('read_only', False)
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        return self.catalog.model.objects.all()
 
-        return extension
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not str(data).isdigit():
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.catalog.get(int(data))
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+    def to_representation(self, value):
+        return value.pk
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -53,9 +115,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-    )
+    id = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredient
@@ -63,9 +123,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeTagSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all()
-    )
+    id = CatalogRelatedField(tag_catalog)
 
     class Meta:
         model = RecipeTag
@@ -93,6 +151,25 @@ class RecipeIngredientSerializerRead(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+def prune_fields(serializer, fields, omit):
+    """Убирает из сериализатора поля, не вошедшие в fields или в omit."""
+    for name in list(serializer.fields):
+        if (fields and name not in fields) or (
+            name in omit and not omit[name]
+        ):
+            serializer.fields.pop(name)
+            continue
+        nested_fields = fields.get(name)
+        nested_omit = omit.get(name)
+        if nested_fields or nested_omit:
+            field = serializer.fields[name]
+            prune_fields(
+                getattr(field, 'child', field),
+                nested_fields or {},
+                nested_omit or {},
+            )
+
+
 class RecipeSerializerRead(serializers.ModelSerializer):
     author = UserGetSerializer()
     ingredients = RecipeIngredientSerializerRead(
@@ -102,6 +179,7 @@ class RecipeSerializerRead(serializers.ModelSerializer):
     tags = TagSerializer(
         many=True,
     )
+    images = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -115,23 +193,51 @@ class RecipeSerializerRead(serializers.ModelSerializer):
             'text',
             'cooking_time',
             'image',
+            'images',
             'author',
             'is_favorited',
             'is_in_shopping_cart'
         )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        omit = self.context.get('omit')
+        if fields or omit:
+            prune_fields(self, fields or {}, omit or {})
+
+    def get_images(self, data):
+        request = self.context.get('request')
+        images = {}
+        for field in IMAGE_VARIANTS:
+            image = getattr(data, field) or data.image
+            url = image.url if image else None
+            if url and request is not None:
+                url = request.build_absolute_uri(url)
+            images[field.replace('image_', '')] = url
+        return images
+
     def get_is_favorited(self, data):
+        if hasattr(data, 'is_favorited'):
+            return data.is_favorited
         return Favorite.objects.filter(
             user=self.context['request'].user.id,
             recipe__id=data.id,
         ).exists()
 
     def get_is_in_shopping_cart(self, data):
+        if hasattr(data, 'is_in_shopping_cart'):
+            return data.is_in_shopping_cart
         return ShoppingCart.objects.filter(
             user=self.context['request'].user.id,
             recipe__id=data.id,
         ).exists()
 
+    def to_representation(self, instance):
+        if 'author' in self.fields and hasattr(instance, 'is_subscribed'):
+            instance.author.is_subscribed = instance.is_subscribed
+        return super().to_representation(instance)
+
 
 class RecipeSerializerPost(serializers.ModelSerializer):
     image = Base64ImageField(
@@ -141,10 +247,11 @@ class RecipeSerializerPost(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         many=True,
         source='recipe_ingredient',
+        write_only=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        write_only=True,
     )
     author = UserGetSerializer(
         read_only=True,
@@ -165,36 +272,33 @@ class RecipeSerializerPost(serializers.ModelSerializer):
     def validate_tags(self, tags):
         if not tags:
             raise serializers.ValidationError('Empty tag list')
-        lst_tags = []
-        for tag in tags:
-            if not Tag.objects.filter(id=tag.id).exists():
-                raise serializers.ValidationError(
-                    'No such tag'
-                )
-            if tag in lst_tags:
-                raise serializers.ValidationError(
-                    'Tags must be unique'
-                )
-            lst_tags.append(tag)
+        if len(set(tags)) != len(tags):
+            raise serializers.ValidationError(
+                'Tags must be unique'
+            )
+        if tag_catalog.missing(tags):
+            raise serializers.ValidationError(
+                'No such tag'
+            )
         return tags
 
     def validate_ingredients(self, data):
         if not data:
             raise serializers.ValidationError('Empty ingredient list')
-        ingredients = self.initial_data.get('ingredients')
-        lst_ingredients = []
-        for ingredient in ingredients:
-            if not Ingredient.objects.filter(id=ingredient['id']).exists():
-                raise serializers.ValidationError(
-                    'No such ingredient'
-                )
-            if ingredient in lst_ingredients:
-                raise serializers.ValidationError(
-                    'Ingredients must be unique'
-                )
-            lst_ingredients.append(ingredient)
-        return ingredients
+        ids = [ingredient['id'] for ingredient in data]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Ingredients must be unique'
+            )
+        if ingredient_index.missing(ids):
+            raise serializers.ValidationError(
+                'No such ingredient'
+            )
+        return {
+            ingredient['id']: ingredient['amount'] for ingredient in data
+        }
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipe_ingredient')
@@ -202,17 +306,12 @@ class RecipeSerializerPost(serializers.ModelSerializer):
             **validated_data,
             author=self.context['request'].user
         )
-        recipe.tags.set(tags)
-        for ingredient in ingredients:
-            recipe.ingredients.add(
-                ingredient.get('id'),
-                through_defaults={
-                    'amount': ingredient.get('amount'),
-                }
-            )
-
+        self.update_tags(recipe, tags)
+        self.update_ingredients(recipe, ingredients)
+        schedule_variants(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.pop('name', instance.name)
         instance.text = validated_data.pop('text', instance.text)
@@ -220,37 +319,94 @@ class RecipeSerializerPost(serializers.ModelSerializer):
             'cooking_time',
             instance.cooking_time
         )
-        instance.image = validated_data.pop('image', instance.image)
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('recipe_ingredient')
-        RecipeTag.objects.filter(recipe=instance).delete()
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        for tag in tags:
-            instance.tags.add(
-                tag.id,
-            )
-        for ingredient in ingredients:
-            instance.ingredients.add(
-                ingredient.get('id'),
-                through_defaults={
-                    'amount': ingredient.get('amount'),
-                }
-            )
+        if 'image' in validated_data:
+            instance.image = validated_data.pop('image')
+            for field in IMAGE_VARIANTS:
+                setattr(instance, field, '')
+            schedule_variants(instance)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('recipe_ingredient', None)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
         instance.save()
         return instance
 
+    def update_tags(self, recipe, tags):
+        current = set(RecipeTag.objects.filter(
+            recipe=recipe
+        ).values_list('tag_id', flat=True))
+        tags = set(tags)
+        if current - tags:
+            RecipeTag.objects.filter(
+                recipe=recipe,
+                tag_id__in=current - tags,
+            ).delete()
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag) for tag in tags - current
+        )
+
+    def update_ingredients(self, recipe, ingredients):
+        """Применяет к рецепту только разницу в ингредиентах.
+
+        Та же разница переносится в списки покупок пользователей, у
+        которых рецепт лежит в корзине.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
+            )
+        }
+        deltas = {}
+        removed = current.keys() - ingredients.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed,
+            ).delete()
+            for ingredient in removed:
+                deltas[ingredient] = -current[ingredient].amount
+        changed = []
+        for ingredient, amount in ingredients.items():
+            recipe_ingredient = current.get(ingredient)
+            if recipe_ingredient is None:
+                deltas[ingredient] = amount
+            elif recipe_ingredient.amount != amount:
+                deltas[ingredient] = amount - recipe_ingredient.amount
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient,
+                amount=amount,
+            )
+            for ingredient, amount in ingredients.items()
+            if ingredient not in current
+        )
+        if current:
+            shopping_list.change_recipe(recipe.id, deltas)
+
     def to_representation(self, instance):
         recipe = super(RecipeSerializerPost, self).to_representation(instance)
-        ingredients = RecipeIngredient.objects.filter(
+        ingredients = list(RecipeIngredient.objects.filter(
             recipe=instance.id
-        )
+        ))
+        for recipe_ingredient in ingredients:
+            recipe_ingredient.ingredient = ingredient_index.get(
+                recipe_ingredient.ingredient_id
+            )
         ingredients_serializer = RecipeIngredientSerializerRead(
             ingredients,
-            source='recipe_ingredient',
             many=True
         )
         tags_serializer = TagSerializer(
-            Tag.objects.filter(pk__in=recipe['tags']),
+            tag_catalog.get_many(RecipeTag.objects.filter(
+                recipe=instance.id
+            ).values_list('tag_id', flat=True)),
             many=True
         )
         recipe['id'] = instance.id
@@ -351,3 +507,11 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         representation.pop('user', None)
         representation.pop('recipe', None)
         return representation
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_LIMIT,
+    )
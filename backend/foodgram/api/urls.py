@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
+from api.async_views import async_patterns
 from api.views import (FavoriteViewSet, IngredientViewSet, RecipeViewSet,
                        ShoppingCartViewSet, TagViewSet, UserViewSet)
 
@@ -21,8 +23,20 @@ router.register(
     basename='shopping_cart'
 )
 
+# Чтение каталога и рецептов и выгрузка списка покупок под ASGI.
+# Запись в тех же маршрутах остаётся синхронной.
+ASYNC_ACTIONS = {
+    RecipeViewSet: ('list', 'retrieve', 'download_shopping_cart'),
+    TagViewSet: ('list', 'retrieve'),
+    IngredientViewSet: ('list', 'retrieve'),
+}
+
+router_urls = router.urls
+if settings.ASYNC_API_VIEWS:
+    router_urls = async_patterns(router_urls, ASYNC_ACTIONS)
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),          # new
     re_path(r'auth/', include('djoser.urls.authtoken')),
 ]
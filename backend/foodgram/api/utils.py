@@ -0,0 +1,69 @@
+import csv
+import io
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+PDF_CHUNK_SIZE = 8192
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_cart_txt(ingredients):
+    for item in ingredients:
+        yield (
+            f'{item["ingredient__name"]} '
+            f'({item["ingredient__measurement_unit"]}) — {item["amount"]}\n'
+        )
+
+
+def shopping_cart_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in ingredients:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['amount'],
+        ))
+
+
+def shopping_cart_pdf(ingredients):
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT)
+        )
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    y = height - PDF_MARGIN
+    pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+    for line in shopping_cart_txt(ingredients):
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, y, line.rstrip('\n'))
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+SHOPPING_CART_FORMATS = {
+    'txt': (shopping_cart_txt, 'text/plain; charset=utf-8'),
+    'csv': (shopping_cart_csv, 'text/csv; charset=utf-8'),
+    'pdf': (shopping_cart_pdf, 'application/pdf'),
+}
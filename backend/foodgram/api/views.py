@@ -1,4 +1,7 @@
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import (BooleanField, OuterRef, Prefetch, Subquery,
+                              Value, prefetch_related_objects)
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.serializers import SetPasswordSerializer
@@ -7,93 +10,245 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
+from foodgram.versions import (INGREDIENTS_VERSION, RECIPES_VERSION,
+                               TAGS_VERSION, USERS_VERSION, get_version)
+from recipes import batch, shopping_list
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import Follow, User
 from users.serializers import (SubscriptionListSerializer, UserGetSerializer,
                                UserRegistrationSerializer)
 
-from .filters import IngredientFilter, RecipeFilter
-from .mixins import (CreateDestroyViewSet, GetListCreateDestroyUpdateViewSet,
-                     GetListCreateViewSet)
-from .pagination import PageLimitPagination
+from .filters import RecipeFilter
+from .mixins import (AnonymousCacheMixin, ConditionalGetMixin,
+                     CreateDestroyViewSet, GetListCreateDestroyUpdateViewSet,
+                     GetListCreateViewSet, SparseFieldsMixin)
+from .pagination import FeedPagination, PageLimitPagination
 from .permissions import RecipePermission, UserPermission
 from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeSerializerPost, RecipeSerializerRead,
-                          ShoppingCartSerializer, TagSerializer)
+                          RecipeIdsSerializer, RecipeSerializerPost,
+                          RecipeSerializerRead, ShoppingCartSerializer,
+                          TagSerializer)
+from .utils import SHOPPING_CART_FORMATS
 
 
-class RecipeViewSet(GetListCreateDestroyUpdateViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,
+    AnonymousCacheMixin,
+    SparseFieldsMixin,
+    GetListCreateDestroyUpdateViewSet,
+):
     queryset = Recipe.objects.all()
+    cache_versions = (
+        RECIPES_VERSION, TAGS_VERSION, INGREDIENTS_VERSION, USERS_VERSION
+    )
+    conditional_actions = ('retrieve',)
+    sparse_actions = ('list', 'retrieve', 'feed')
+    card_actions = ('list', 'feed')
+    card_fields = (
+        'id,name,image,images,cooking_time,tags,is_favorited,'
+        'is_in_shopping_cart,author.id,author.first_name,author.last_name'
+    )
     permission_classes = (RecipePermission,)
     pagination_class = PageLimitPagination
+    cursor_fields = ('-pub_date', '-id')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    validated_recipe = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve', 'feed'):
+            return queryset
+        queryset = queryset.defer('search_vector')
+        if not self.field_requested('text'):
+            queryset = queryset.defer('text')
+        if self.field_requested('author'):
+            queryset = queryset.select_related('author')
+        return queryset.prefetch_related(
+            *self.get_prefetch_lookups()
+        ).with_user_flags(self.request.user)
+
+    def get_prefetch_lookups(self):
+        lookups = []
+        if self.field_requested('tags'):
+            lookups.append('tags')
+        if self.field_requested('ingredients'):
+            lookups.append(Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ),
+            ))
+        return lookups
+
+    def get_validators(self, request):
+        pk = self.kwargs[self.lookup_field]
+        if not pk.isdigit():
+            return None
+        # Та же строка с флагами пользователя отдаётся get_object, поэтому
+        # при ответе 200 рецепт повторно не читается, а теги и ингредиенты
+        # подгружаются только для него.
+        recipe = self.filter_queryset(
+            self.get_queryset()
+        ).prefetch_related(None).filter(pk=pk).first()
+        if recipe is None:
+            return None
+        self.validated_recipe = recipe
+        state = (
+            recipe.updated_at,
+            recipe.is_favorited,
+            recipe.is_in_shopping_cart,
+            recipe.is_subscribed,
+        )
+        versions = [
+            get_version(name)
+            for name in (TAGS_VERSION, INGREDIENTS_VERSION, USERS_VERSION)
+        ]
+        if request.user.is_authenticated:
+            # Флаги избранного, корзины и подписки меняются без updated_at
+            # рецепта, поэтому такой ответ проверяется только по ETag.
+            return (state, versions), None
+        return (
+            (state, versions),
+            max(recipe.updated_at.timestamp(), *versions),
+        )
+
+    def get_object(self):
+        recipe = self.validated_recipe
+        if recipe is None:
+            return super().get_object()
+        self.check_object_permissions(self.request, recipe)
+        prefetch_related_objects([recipe], *self.get_prefetch_lookups())
+        return recipe
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed'):
             return RecipeSerializerRead
         else:
             return RecipeSerializerPost
 
+    @action(methods=['get'],
+            detail=False,
+            url_path=r'feed',
+            permission_classes=(permissions.IsAuthenticated,)
+            )
+    def feed(self, request):
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(
+            self.get_queryset(), request, view=self
+        )
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        shopping_list.change_recipe(instance.id, {
+            ingredient: -amount
+            for ingredient, amount in shopping_list.recipe_amounts(
+                instance.id
+            ).items()
+        })
+        instance.delete()
+
+    def change_recipe_list(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = (
+            batch.add_recipes if request.method == 'POST'
+            else batch.remove_recipes
+        )
+        return Response({'recipes': change(
+            model, request.user, serializer.validated_data['recipes']
+        )})
+
+    @action(methods=['post', 'delete'],
+            detail=False,
+            url_path=r'favorite',
+            permission_classes=(permissions.IsAuthenticated,)
+            )
+    def favorite_batch(self, request):
+        return self.change_recipe_list(request, Favorite)
+
+    @action(methods=['post', 'delete'],
+            detail=False,
+            url_path=r'shopping_cart',
+            permission_classes=(permissions.IsAuthenticated,)
+            )
+    def shopping_cart_batch(self, request):
+        return self.change_recipe_list(request, ShoppingCart)
+
     @action(methods=['get'],
             detail=False,
             url_path=r'download_shopping_cart',
             permission_classes=(permissions.IsAuthenticated, )
             )
     def download_shopping_cart(self, request):
-        user = request.user
-        shopping_cart = ShoppingCart.objects.filter(
-            user=user
-        ).values_list('recipe_id')
-        recipes = Recipe.objects.filter(
-            pk__in=shopping_cart
-        )
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__in=recipes
-        )
-        ingredient_dict = {}
-        for recipeingredient in ingredients:
-            ingredient = Ingredient.objects.get(
-                id=recipeingredient.ingredient_id
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in SHOPPING_CART_FORMATS:
+            return Response(
+                {'error': 'Unsupported file type'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            data = [
-                ingredient.name,
-                ingredient.measurement_unit,
-                recipeingredient.amount
-            ]
-            if ingredient.name in ingredient_dict:
-                ingredient_dict[ingredient.name][2] += data[2]
-            else:
-                ingredient_dict[ingredient.name] = data
-        shopping_list = ''
-        for lst in ingredient_dict.values():
-            shopping_list += (f'{lst[0]} ({lst[1]}) — {lst[2]}\n')
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        ingredients = []
+        for ingredient_id, amount in ShoppingListItem.objects.filter(
+            user=request.user
+        ).values_list('ingredient_id', 'amount'):
+            ingredient = ingredient_index.get(ingredient_id)
+            if ingredient is not None:
+                ingredients.append({
+                    'ingredient__name': ingredient.name,
+                    'ingredient__measurement_unit': (
+                        ingredient.measurement_unit
+                    ),
+                    'amount': amount,
+                })
+        ingredients.sort(key=lambda item: item['ingredient__name'])
+        generator, content_type = SHOPPING_CART_FORMATS[file_type]
+        response = StreamingHttpResponse(
+            generator(ingredients),
+            content_type=content_type
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{file_type}"'
         )
         return response
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(
+    ConditionalGetMixin,
+    AnonymousCacheMixin,
+    ReadOnlyModelViewSet,
+):
     queryset = Tag.objects.all()
+    cache_versions = (TAGS_VERSION,)
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ConditionalGetMixin,
+    AnonymousCacheMixin,
+    ReadOnlyModelViewSet,
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (IngredientFilter, )
-    search_fields = ('^name', )
+    cache_versions = (INGREDIENTS_VERSION,)
+
+    def get_queryset(self):
+        name = self.request.query_params.get('name', '').strip()
+        if self.action == 'list' and name:
+            return ingredient_index.search(name)
+        return super().get_queryset()
 
 
 class UserViewSet(GetListCreateViewSet):
     queryset = User.objects.all()
     permission_classes = (UserPermission,)
     pagination_class = PageLimitPagination
+    cursor_fields = ('id',)
 
     def get_serializer_class(self):
         if self.action in ['list', 'get']:
@@ -140,7 +295,13 @@ class UserViewSet(GetListCreateViewSet):
         ).values_list('author_id')
         users = User.objects.filter(
             pk__in=subs
-        )
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(Prefetch(
+            'recipes',
+            queryset=self.get_subscription_recipes(request),
+            to_attr='subscription_recipes',
+        )).order_by('id')
         page = self.paginate_queryset(users)
         if page is not None:
             return self.get_paginated_response(SubscriptionListSerializer(
@@ -154,6 +315,19 @@ class UserViewSet(GetListCreateViewSet):
             many=True
         ).data, status=status.HTTP_200_OK)
 
+    def get_subscription_recipes(self, request):
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time', 'author_id', 'pub_date'
+        ).order_by('-pub_date', '-id')
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        if not recipes_limit.isdigit():
+            return recipes
+        return recipes.filter(id__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')
+            ).order_by('-pub_date', '-id').values('id')[:int(recipes_limit)]
+        ))
+
     @action(methods=['post'],
             detail=True,
             url_path=r'subscribe',
@@ -236,8 +410,17 @@ class ShoppingCartViewSet(CreateDestroyViewSet):
     serializer_class = ShoppingCartSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        cart = serializer.save()
+        shopping_list.add_recipe(cart.user_id, cart.recipe_id)
+
+    @transaction.atomic
     def delete(self, request, recipe_id=None):
         user = request.user
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        favorite_shopping_cart_delete(ShoppingCart, user, recipe)
+        error = favorite_shopping_cart_delete(ShoppingCart, user, recipe)
+        if error is None:
+            # Список покупок меняется, только если рецепт был в корзине.
+            shopping_list.remove_recipe(user.id, recipe.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
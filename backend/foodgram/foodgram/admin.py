@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator, который не считает COUNT(*) по большим таблицам.
+
+    Для списка без фильтров на PostgreSQL число строк берётся из
+    статистики pg_class. Если оценка меньше ADMIN_EXACT_COUNT_LIMIT,
+    нет статистики или база другая, выполняется обычный COUNT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = self.estimate(queryset)
+            if estimate is not None and (
+                estimate >= settings.ADMIN_EXACT_COUNT_LIMIT
+            ):
+                return estimate
+        return super().count
+
+    def estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = to_regclass(%s)',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < 0:
+            return None
+        return row[0]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Админка для таблиц, где точные счётчики строк слишком дороги."""
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
@@ -0,0 +1,17 @@
+import json
+
+from django.db import connections
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса PostgreSQL без COUNT(*)."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
@@ -0,0 +1,58 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Можно ли сейчас читать с реплик. Включает ReplicaStickinessMiddleware
+# для безопасных запросов; команды, сигналы и фоновые потоки читают
+# с основной базы.
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def set_replica_reads(value):
+    token = replica_reads.set(value)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def use_primary():
+    """Читать с основной базы внутри блока, например при заполнении кэша."""
+    return set_replica_reads(False)
+
+
+class ReplicaRouter:
+    """Пишет в default, читает со случайной реплики из DATABASES.
+
+    С реплик читают только запросы, которым это разрешил middleware, и
+    только вне транзакции. После первой записи запрос до конца читает
+    с основной базы, чтобы видеть свои изменения.
+    """
+
+    def __init__(self):
+        self.replicas = [
+            alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS
+        ]
+
+    def db_for_read(self, model, **hints):
+        if (
+            not self.replicas
+            or not replica_reads.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        replica_reads.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,296 @@
+import gzip
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from .db_router import set_replica_reads
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('foodgram.performance')
+
+STICKY_KEY = 'foodgram:primary:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+ACCEPT_ENCODING = re.compile(r'([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper, считающая запросы и время SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[sql] += 1
+
+    @property
+    def duplicates(self):
+        return {
+            sql: count for sql, count in self.fingerprints.items()
+            if count > 1
+        }
+
+
+@contextmanager
+def record_queries(recorder):
+    """Подключает recorder ко всем соединениям текущего потока."""
+    with ExitStack() as stack:
+        if recorder is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+def get_endpoint(request):
+    match = request.resolver_match
+    if match is None:
+        return None
+    view = getattr(match.func, 'cls', match.func)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view.__name__}.{action}'
+
+
+class QueryInstrumentationMiddleware:
+    """Замеряет число и время SQL-запросов для каждого эндпоинта.
+
+    Результат отдаётся в заголовке Server-Timing и пишется в лог
+    foodgram.performance. Если для эндпоинта задан бюджет в
+    settings.QUERY_BUDGETS и он превышен, в лог пишется предупреждение,
+    а при QUERY_BUDGET_STRICT = True выбрасывается QueryBudgetExceeded.
+    Под ASGI запросы считаются только у асинхронных обёрток из
+    api/async_views.py: они подключают request.query_recorder в своём потоке.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with record_queries(recorder):
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        # Асинхронные view выполняют запросы в своих потоках и сами
+        # подключают request.query_recorder к соединениям.
+        recorder = request.query_recorder = QueryRecorder()
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    def finish(self, request, response, recorder, started):
+        duration = time.perf_counter() - started
+        endpoint = get_endpoint(request)
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.2f};'
+            f'desc="{recorder.count} queries", '
+            f'app;dur={duration * 1000:.2f}'
+        )
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'sql_ms': round(recorder.duration * 1000, 2),
+            'queries': recorder.count,
+            'duplicates': recorder.duplicates,
+        }, ensure_ascii=False))
+        self.check_budget(endpoint, recorder)
+        return response
+
+    def check_budget(self, endpoint, recorder):
+        budget = settings.QUERY_BUDGETS.get(endpoint)
+        if budget is None or recorder.count <= budget:
+            return
+        message = (
+            f'{endpoint} made {recorder.count} queries, budget is {budget}'
+        )
+        logger.warning(message)
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+
+
+def compress_gzip(content):
+    return gzip.compress(
+        content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0
+    )
+
+
+def compress_brotli(content):
+    return brotli.compress(
+        content, quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+
+
+# В порядке предпочтения при равном q.
+ENCODINGS = {'gzip': compress_gzip}
+if brotli is not None:
+    ENCODINGS = {'br': compress_brotli, **ENCODINGS}
+
+
+def choose_encoding(accept_encoding):
+    """Выбирает кодировку из Accept-Encoding с учётом q-значений."""
+    weights = {}
+    for name, weight in ACCEPT_ENCODING.findall(accept_encoding.lower()):
+        try:
+            weights[name] = float(weight) if weight else 1.0
+        except ValueError:
+            continue
+    best, best_weight = None, 0
+    for name in ENCODINGS:
+        weight = weights.get(name, weights.get('*', 0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+class CompressionMiddleware:
+    """Сжимает ответы brotli или gzip по заголовку Accept-Encoding.
+
+    Сжимаются только ответы с типом из COMPRESSION_CONTENT_TYPES и телом
+    не короче COMPRESSION_MIN_SIZE. Потоковые ответы (выгрузка списка
+    покупок) отдаются как есть. Brotli доступен, если установлен пакет
+    Brotli, иначе используется gzip.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+        content = ENCODINGS[encoding](response.content)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # Сжатое тело побайтно отличается от исходного.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+def get_sticky_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return STICKY_KEY.format(
+        hashlib.sha256(authorization.encode()).hexdigest()
+    )
+
+
+class ReplicaStickinessMiddleware:
+    """Разрешает безопасным запросам читать с реплик.
+
+    После POST, PUT, PATCH или DELETE клиент REPLICA_STICKY_SECONDS
+    секунд читает с основной базы и видит свои изменения. Браузер
+    узнаётся по cookie, клиенты API - по хэшу заголовка Authorization
+    в общем кэше (между процессами - только с общим CACHE_BACKEND).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with set_replica_reads(self.can_read_replica(request)):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        with set_replica_reads(self.can_read_replica(request)):
+            response = await self.get_response(request)
+        return self.finish(request, response)
+
+    def can_read_replica(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        if request.COOKIES.get(settings.REPLICA_STICKY_COOKIE):
+            return False
+        key = get_sticky_key(request)
+        return key is None or not cache.get(key)
+
+    def finish(self, request, response):
+        if request.method in SAFE_METHODS:
+            return response
+        window = settings.REPLICA_STICKY_SECONDS
+        response.set_cookie(
+            settings.REPLICA_STICKY_COOKIE,
+            '1',
+            max_age=window,
+            httponly=True,
+            samesite='Lax',
+        )
+        key = get_sticky_key(request)
+        if key is not None:
+            cache.set(key, True, window)
+        return response
@@ -23,7 +23,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY', 'default-secret-key')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = os.getenv('DEBUG', 'False')
+DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost').split()
 
@@ -46,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.QueryInstrumentationMiddleware',
+    'foodgram.middleware.CompressionMiddleware',
+    'foodgram.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,9 +93,76 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: хосты через запятую, остальное как у default.
+# Запросы после записи читают с default ещё REPLICA_STICKY_SECONDS секунд.
+for number, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+REPLICA_STICKY_COOKIE = 'use_primary'
+
+# Общий кэш нужен для согласования версий данных между процессами.
+# Кэш в памяти процесса допустим для разработки и тестов, его
+# отклоняет manage.py check --deploy (recipes/checks.py).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Асинхронные обёртки для view каталога и рецептов при запуске под ASGI.
+ASYNC_API_VIEWS = os.getenv('ASYNC_API_VIEWS', 'False') == 'True'
+
+# Время жизни закэшированных ответов API для анонимных пользователей.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Конфигурация полнотекстового поиска PostgreSQL.
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+
+# Кэш проверенных токенов в памяти процесса: число записей и TTL в секундах.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+
+# Лента подписок: авторы с большим числом подписчиков не раскладываются
+# по лентам при публикации, а читаются напрямую; после подписки в ленту
+# добавляется FEED_BACKFILL_SIZE последних рецептов автора. Раскладка
+# (до FEED_FANOUT_LIMIT строк) при FEED_FANOUT_ASYNC идёт в фоновом потоке.
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+FEED_FANOUT_ASYNC = os.getenv('FEED_FANOUT_ASYNC', 'True') == 'True'
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 100))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+
+# Наибольшее число рецептов в одном пакетном запросе избранного и корзины.
+RECIPE_BATCH_LIMIT = int(os.getenv('RECIPE_BATCH_LIMIT', 100))
+
+# Начиная с этой оценки числа строк админка не делает точный COUNT(*).
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', 10000))
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ограничения для загружаемых изображений рецептов.
+MAX_UPLOAD_IMAGE_SIZE = int(os.getenv('MAX_UPLOAD_IMAGE_SIZE', 10 * 1024 * 1024))
+MAX_UPLOAD_IMAGE_DIMENSION = int(os.getenv('MAX_UPLOAD_IMAGE_DIMENSION', 6000))
+IMAGE_VARIANTS_ASYNC = os.getenv('IMAGE_VARIANTS_ASYNC', 'True') == 'True'
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -120,10 +190,27 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
+# Сжатие ответов: минимальный размер тела в байтах, типы и уровни сжатия.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_CONTENT_TYPES = (
+    'application/json',
+    'text/html',
+    'text/plain',
+    'text/csv',
+    'text/css',
+    'application/javascript',
+)
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SERIALIZERS': {
@@ -142,6 +229,35 @@ DJOSER = {
     }
 }
 
+# Бюджеты SQL-запросов на эндпоинт ('<ViewSet>.<action>': число запросов).
+QUERY_BUDGETS = {
+    'RecipeViewSet.list': 6,
+    'RecipeViewSet.retrieve': 4,
+    'RecipeViewSet.download_shopping_cart': 2,
+    'TagViewSet.list': 2,
+    'IngredientViewSet.list': 2,
+    'UserViewSet.subscriptions': 4,
+    'RecipeViewSet.feed': 6,
+}
+
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.performance': {
+            'handlers': ['console'],
+            'level': os.getenv('PERFORMANCE_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
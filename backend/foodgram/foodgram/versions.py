@@ -0,0 +1,26 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'foodgram:version:{}'
+
+AUTH_VERSION = 'auth'
+INGREDIENTS_VERSION = 'ingredients'
+RECIPES_VERSION = 'recipes'
+TAGS_VERSION = 'tags'
+USERS_VERSION = 'users'
+
+
+def get_version(name):
+    """Возвращает текущую версию набора данных из общего кэша."""
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Помечает набор данных изменённым во всех процессах."""
+    cache.set(VERSION_KEY.format(name), time.time(), None)
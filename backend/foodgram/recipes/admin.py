@@ -1,14 +1,23 @@
 from django.contrib import admin
 
+from foodgram.admin import LargeTableAdmin
+
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient, RecipeTag,
                      ShoppingCart, Tag)
 
 
-@admin.register(RecipeTag,
-                RecipeIngredient,
-                )
-class PersonAdmin(admin.ModelAdmin):
-    pass
+class RecipeTagAdmin(LargeTableAdmin):
+    list_display = ['recipe', 'tag']
+    list_select_related = ['recipe', 'tag']
+    list_filter = ['tag']
+    autocomplete_fields = ['recipe', 'tag']
+
+
+class RecipeIngredientAdmin(LargeTableAdmin):
+    list_display = ['recipe', 'ingredient', 'amount']
+    list_select_related = ['recipe', 'ingredient']
+    autocomplete_fields = ['recipe', 'ingredient']
+    search_fields = ['^recipe__name', '^ingredient__name']
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -17,36 +26,36 @@ class TagAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ['user', 'recipe']
-    list_filter = ['user', 'recipe']
-    search_fields = ['user', 'recipe']
-    empty_value_display = '-пусто-'
+    list_select_related = ['user', 'recipe']
+    autocomplete_fields = ['user', 'recipe']
+    search_fields = ['^user__username', '^recipe__name']
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ['recipe', 'user']
-    list_filter = ['recipe', 'user']
-    search_fields = ['user', ]
-    empty_value_display = '-пусто-'
-
+    list_select_related = ['user', 'recipe']
+    autocomplete_fields = ['user', 'recipe']
+    search_fields = ['^user__username', ]
 
-class RecipeAdmin(admin.ModelAdmin):
-    list_filter = ['author', 'name', 'tags']
-    list_display = ['name', 'author', 'favorite_count']
 
-    @admin.display(description="Число добавлений в избранное")
-    def favorite_count(self, obj):
-        favorite_count = Favorite.objects.filter(recipe=obj).count()
-        return favorite_count
+class RecipeAdmin(LargeTableAdmin):
+    list_filter = ['tags']
+    list_display = ['name', 'author', 'favorites_count', 'in_carts_count']
+    list_select_related = ['author']
+    search_fields = ['^name', '^author__username']
+    autocomplete_fields = ['author']
 
 
-class IngredientAdmin(admin.ModelAdmin):
-    list_filter = ['name', 'measurement_unit']
-    search_fields = ['name', ]
-    list_display = ['name', ]
+class IngredientAdmin(LargeTableAdmin):
+    list_filter = ['measurement_unit']
+    search_fields = ['^name', ]
+    list_display = ['name', 'measurement_unit']
 
 
+admin.site.register(RecipeTag, RecipeTagAdmin)
+admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
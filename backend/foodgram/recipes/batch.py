@@ -0,0 +1,98 @@
+from django.db import connections, router, transaction
+
+from . import shopping_list
+from .counters import COUNTERS, batch_counters, change_counters
+from .models import Recipe, ShoppingCart
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+
+
+def split_recipes(model, user, recipe_ids, lock=False):
+    """Возвращает существующие рецепты и те из них, что уже в списке.
+
+    С lock строки списка блокируются до конца транзакции.
+    """
+    found = set(Recipe.objects.filter(
+        id__in=recipe_ids
+    ).values_list('id', flat=True))
+    linked = model.objects.filter(user=user, recipe_id__in=found)
+    if lock:
+        linked = linked.select_for_update()
+    return found, set(linked.values_list('recipe_id', flat=True))
+
+
+def update_counters(model, recipe_ids, delta):
+    # INSERT в insert_recipes не шлёт сигналы, счётчики меняются здесь.
+    for owner, field, related, _ in COUNTERS:
+        if related is model:
+            change_counters(owner, recipe_ids, field, delta)
+
+
+def insert_recipes(model, user, recipe_ids):
+    """Вставляет рецепты в список одним INSERT, пропуская уже добавленные.
+
+    Возвращает id рецептов, строки которых действительно вставлены
+    (ON CONFLICT DO NOTHING RETURNING): строку, которую успел вставить
+    конкурентный запрос, не посчитаем дважды.
+    """
+    if not recipe_ids:
+        return set()
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    user_column = quote(model._meta.get_field('user').column)
+    recipe_column = quote(model._meta.get_field('recipe').column)
+    values = ', '.join(['(%s, %s)'] * len(recipe_ids))
+    params = [
+        value for recipe_id in recipe_ids for value in (user.id, recipe_id)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} '
+            f'({user_column}, {recipe_column}) VALUES {values} '
+            f'ON CONFLICT DO NOTHING RETURNING {recipe_column}',
+            params,
+        )
+        return {recipe_id for recipe_id, in cursor.fetchall()}
+
+
+def results(recipe_ids, found, changed, done, skipped):
+    return [
+        {
+            'id': recipe_id,
+            'status': (
+                NOT_FOUND if recipe_id not in found
+                else done if recipe_id in changed else skipped
+            ),
+        }
+        for recipe_id in dict.fromkeys(recipe_ids)
+    ]
+
+
+@transaction.atomic
+def add_recipes(model, user, recipe_ids):
+    """Добавляет рецепты в избранное или корзину одним INSERT."""
+    found, linked = split_recipes(model, user, recipe_ids)
+    added = insert_recipes(model, user, sorted(found - linked))
+    update_counters(model, added, 1)
+    if model is ShoppingCart:
+        shopping_list.add_recipes(user.id, added)
+    return results(recipe_ids, found, added, ADDED, EXISTS)
+
+
+@transaction.atomic
+def remove_recipes(model, user, recipe_ids):
+    """Убирает рецепты из избранного или корзины одним DELETE.
+
+    Счётчики меняют сигналы post_delete удалённых строк, собранные
+    batch_counters() в один UPDATE.
+    """
+    found, linked = split_recipes(model, user, recipe_ids, lock=True)
+    with batch_counters():
+        model.objects.filter(user=user, recipe_id__in=linked).delete()
+    if model is ShoppingCart:
+        shopping_list.remove_recipes(user.id, linked)
+    return results(recipe_ids, found, linked, REMOVED, MISSING)
@@ -0,0 +1,72 @@
+import threading
+
+from foodgram.db_router import use_primary
+from foodgram.versions import TAGS_VERSION, get_version
+
+from .models import Tag
+
+
+class Catalog:
+    """Справочник в памяти процесса, сверяемый с общей версией.
+
+    Таблица читается целиком при первом обращении и перечитывается, когда
+    в общем кэше меняется версия набора данных. Обычное обращение стоит
+    одного чтения версии из кэша вместо запроса к базе.
+    """
+
+    def __init__(self, model, version):
+        self.model = model
+        self.version = version
+        self._lock = threading.Lock()
+        self._version = None
+        self._state = None
+
+    def __deepcopy__(self, memo):
+        # Справочник один на процесс: DRF копирует аргументы полей
+        # сериализатора, и копия не должна строиться заново.
+        return self
+
+    def build(self, objects):
+        return {'by_id': {obj.pk: obj for obj in objects}}
+
+    def get_state(self):
+        version = get_version(self.version)
+        if self._state is None or self._version != version:
+            with self._lock:
+                if self._state is None or self._version != version:
+                    # Отстающая реплика закрепила бы старые данные
+                    # под новой версией.
+                    with use_primary():
+                        objects = list(self.model.objects.all())
+                    self._state = self.build(objects)
+                    self._version = version
+        return self._state
+
+    def get(self, pk):
+        return self.get_state()['by_id'].get(pk)
+
+    def get_many(self, pks):
+        by_id = self.get_state()['by_id']
+        return [by_id[pk] for pk in pks if pk in by_id]
+
+    def missing(self, pks):
+        """Возвращает id, которых нет в справочнике."""
+        return set(pks) - self.get_state()['by_id'].keys()
+
+
+class TagCatalog(Catalog):
+
+    def build(self, objects):
+        state = super().build(objects)
+        state['by_slug'] = {tag.slug: tag.pk for tag in objects}
+        return state
+
+    def slugs(self):
+        return self.get_state()['by_slug'].keys()
+
+    def ids_by_slugs(self, slugs):
+        by_slug = self.get_state()['by_slug']
+        return [by_slug[slug] for slug in slugs if slug in by_slug]
+
+
+tag_catalog = TagCatalog(Tag, TAGS_VERSION)
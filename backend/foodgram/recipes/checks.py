@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии наборов данных, кэш ответов и отзыв токенов работают только
+    с кэшем, общим для всех воркеров.
+    """
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [Error(
+        'CACHE_BACKEND must be shared between workers (Memcached, Redis)',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION, e.g. PyMemcacheCache '
+             'and memcached:11211.',
+        id='recipes.E001',
+    )]
@@ -0,0 +1,89 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from users.models import Follow, User
+
+from .models import Favorite, Recipe, ShoppingCart
+
+# Модель и поле счётчика, модель связи и её поле, указывающее на владельца.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+# Изменения счётчиков, отложенные внутри batch_counters().
+pending_counters = ContextVar('pending_counters', default=None)
+
+
+def change_counter(model, pk, field, delta):
+    """Меняет счётчик одним UPDATE через F(), без чтения строки.
+
+    Внутри batch_counters() изменение откладывается до выхода из блока.
+    """
+    pending = pending_counters.get()
+    if pending is not None:
+        pending[model, field][pk] += delta
+        return
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_counters(model, pks, field, delta):
+    """То же для пачки строк: один UPDATE ... WHERE id IN."""
+    if not pks:
+        return
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+@contextmanager
+def batch_counters():
+    """Копит изменения счётчиков из сигналов и применяет их пачкой.
+
+    На выходе из блока каждому счётчику и величине изменения достаётся
+    один UPDATE ... WHERE id IN вместо UPDATE на каждую строку.
+    """
+    pending = defaultdict(Counter)
+    token = pending_counters.set(pending)
+    try:
+        yield
+    finally:
+        pending_counters.reset(token)
+    for (model, field), deltas in pending.items():
+        pks_by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            if delta:
+                pks_by_delta[delta].append(pk)
+        for delta, pks in pks_by_delta.items():
+            change_counters(model, pks, field, delta)
+
+
+def count_related(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), Value(0))
+
+
+def repair_counters():
+    """Пересчитывает счётчики и возвращает число исправленных строк."""
+    fixed = {}
+    for model, field, related, lookup in COUNTERS:
+        actual = count_related(related, lookup)
+        fixed[f'{model.__name__}.{field}'] = model.objects.exclude(
+            **{field: actual}
+        ).update(**{field: actual})
+    return fixed
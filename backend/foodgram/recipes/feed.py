@@ -0,0 +1,184 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+
+from users.models import Follow, User
+
+from .models import FeedEntry, Recipe
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+# Раскладка пишет до FEED_FANOUT_LIMIT строк на рецепт, поэтому при
+# FEED_FANOUT_ASYNC она идёт в отдельном потоке, а не в запросе.
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='feed')
+
+
+def is_celebrity(author_id):
+    """Ленты подписчиков таких авторов собираются при чтении.
+
+    Счётчик читается из базы: у объекта автора в памяти он может
+    отставать от UPDATE через F().
+    """
+    return User.objects.filter(
+        pk=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def fan_out(recipe_id):
+    """Раскладывает новый рецепт по лентам подписчиков автора.
+
+    Не больше FEED_FANOUT_LIMIT строк пачками по BATCH_SIZE.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if recipe is None or is_celebrity(recipe['author_id']):
+        return
+    followers = Follow.objects.filter(
+        author=recipe['author_id']
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=follower,
+                recipe_id=recipe['id'],
+                author_id=recipe['author_id'],
+                pub_date=recipe['pub_date'],
+            )
+            for follower in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def run_in_worker(recipe_id):
+    try:
+        fan_out(recipe_id)
+    except Exception:
+        logger.exception('Feed fan-out failed for recipe %s', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_fan_out(recipe_id):
+    """Запускает раскладку рецепта после коммита транзакции."""
+    if settings.FEED_FANOUT_ASYNC:
+        transaction.on_commit(
+            lambda: executor.submit(run_in_worker, recipe_id)
+        )
+    else:
+        transaction.on_commit(lambda: fan_out(recipe_id))
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    recipes = Recipe.objects.filter(author=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in recipes
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_sources(user):
+    """Источники ленты пользователя и поле id рецепта в каждом из них.
+
+    Рецепты обычных авторов читаются из FeedEntry, рецепты авторов с
+    числом подписчиков больше FEED_FANOUT_LIMIT - напрямую из Recipe.
+    Записи FeedEntry таких авторов, оставшиеся с тех пор, когда у них было
+    меньше подписчиков, пропускаются, чтобы рецепт не попал в ленту дважды.
+    """
+    celebrities = Follow.objects.filter(
+        user=user,
+        author__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values('author_id')
+    return (
+        (FeedEntry.objects.filter(user=user).exclude(
+            author__in=celebrities
+        ), 'recipe_id'),
+        (Recipe.objects.filter(author__in=celebrities), 'id'),
+    )
+
+
+def feed_page(user, position=None, reverse=False, limit=None):
+    """Пары (pub_date, id рецепта) страницы ленты после позиции курсора.
+
+    Каждый источник читается по своему индексу в порядке
+    (-pub_date, -id) не больше чем на limit строк, затем строки
+    сливаются в том же порядке. При reverse порядок обратный.
+    """
+    lookup = 'gt' if reverse else 'lt'
+    rows = set()
+    for queryset, field in feed_sources(user):
+        if position is not None:
+            pub_date, recipe_id = position
+            queryset = queryset.filter(
+                Q(**{f'pub_date__{lookup}': pub_date})
+                | Q(pub_date=pub_date, **{f'{field}__{lookup}': recipe_id})
+            )
+        ordering = (
+            ('pub_date', field) if reverse else ('-pub_date', f'-{field}')
+        )
+        rows.update(queryset.order_by(*ordering).values_list(
+            'pub_date', field
+        )[:limit])
+    return sorted(rows, reverse=not reverse)[:limit]
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты из подписок с нуля."""
+    entries = FeedEntry.objects.all()
+    follows = Follow.objects.exclude(
+        author__followers_count__gt=settings.FEED_FANOUT_LIMIT
+    )
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    entries.delete()
+    recent = defaultdict(list)
+    for recipe_id, author_id, pub_date in Recipe.objects.filter(
+        author__in=follows.values('author_id')
+    ).order_by('author_id', '-pub_date', '-id').values_list(
+        'id', 'author_id', 'pub_date'
+    ).iterator():
+        if len(recent[author_id]) < settings.FEED_BACKFILL_SIZE:
+            recent[author_id].append((recipe_id, pub_date))
+    return len(FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id, author_id in follows.values_list(
+                'user_id', 'author_id'
+            ).iterator()
+            for recipe_id, pub_date in recent[author_id]
+        ),
+        batch_size=BATCH_SIZE,
+    ))
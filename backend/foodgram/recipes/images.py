@@ -0,0 +1,93 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from foodgram.versions import RECIPES_VERSION, bump_version
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Поле модели: (максимальный размер стороны, формат Pillow, расширение).
+IMAGE_VARIANTS = {
+    'image_thumbnail': (480, 'JPEG', 'jpg'),
+    'image_detail': (1200, 'JPEG', 'jpg'),
+    'image_webp': (1200, 'WEBP', 'webp'),
+}
+VARIANT_QUALITY = 85
+ORIGINAL_QUALITY = 90
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_VARIANT_WORKERS,
+    thread_name_prefix='image-variants',
+)
+
+
+def normalize_image(image):
+    """Поворачивает изображение по EXIF и пересохраняет без метаданных."""
+    image_format = image.format
+    image = ImageOps.exif_transpose(image)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=ORIGINAL_QUALITY)
+    return buffer.getvalue()
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail((size, size))
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = io.BytesIO()
+    variant.save(buffer, format=image_format, quality=VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def generate_variants(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    with recipe.image.open('rb') as f:
+        image = Image.open(f)
+        image.load()
+    name = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    for field, (size, image_format, extension) in IMAGE_VARIANTS.items():
+        getattr(recipe, field).save(
+            f'{name}.{extension}',
+            ContentFile(render_variant(image, size, image_format)),
+            save=False,
+        )
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(updated_at=timezone.now(), **{
+        field: getattr(recipe, field).name for field in IMAGE_VARIANTS
+    })
+    if updated:
+        bump_version(RECIPES_VERSION)
+
+
+def run_in_worker(recipe_id):
+    try:
+        generate_variants(recipe_id)
+    except Exception:
+        logger.exception('Image variants failed for recipe %s', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe):
+    """Запускает генерацию вариантов после коммита транзакции."""
+    if settings.IMAGE_VARIANTS_ASYNC:
+        transaction.on_commit(
+            lambda: executor.submit(run_in_worker, recipe.pk)
+        )
+    else:
+        transaction.on_commit(lambda: generate_variants(recipe.pk))
@@ -0,0 +1,68 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+
+from foodgram.versions import INGREDIENTS_VERSION
+
+from .catalog import Catalog
+from .models import Ingredient
+
+TRIGRAM_SIZE = 3
+
+
+def trigrams(value):
+    return {
+        value[i:i + TRIGRAM_SIZE]
+        for i in range(len(value) - TRIGRAM_SIZE + 1)
+    }
+
+
+class IngredientIndex(Catalog):
+    """Справочник ингредиентов в памяти процесса с автодополнением.
+
+    Префиксный поиск идёт бинарным поиском по отсортированным названиям,
+    поиск по подстроке - через пересечение триграмм. Индекс строится при
+    первом обращении и перестраивается, когда меняется версия
+    ингредиентов.
+    """
+
+    def build(self, objects):
+        state = super().build(objects)
+        ingredients = sorted(
+            objects,
+            key=lambda ingredient: (ingredient.name.casefold(), ingredient.id)
+        )
+        keys = [ingredient.name.casefold() for ingredient in ingredients]
+        postings = defaultdict(set)
+        for position, key in enumerate(keys):
+            for trigram in trigrams(key):
+                postings[trigram].add(position)
+        state.update(ingredients=ingredients, keys=keys, postings=postings)
+        return state
+
+    def search(self, query, limit=None):
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        query = query.strip().casefold()
+        state = self.get_state()
+        ingredients = state['ingredients']
+        keys = state['keys']
+        postings = state['postings']
+        start = bisect_left(keys, query)
+        end = bisect_right(keys, query + chr(0x10FFFF))
+        found = list(range(start, min(end, start + limit)))
+        if len(found) >= limit or len(query) < TRIGRAM_SIZE:
+            return [ingredients[position] for position in found]
+        candidates = set.intersection(
+            *(postings.get(trigram, set()) for trigram in trigrams(query))
+        )
+        for position in sorted(candidates):
+            if len(found) >= limit:
+                break
+            if not start <= position < end and query in keys[position]:
+                found.append(position)
+        return [ingredients[position] for position in found]
+
+
+ingredient_index = IngredientIndex(Ingredient, INGREDIENTS_VERSION)
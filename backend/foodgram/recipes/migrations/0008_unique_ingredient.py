@@ -0,0 +1,58 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:24
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+# Верхняя граница PositiveSmallIntegerField.
+MAX_AMOUNT = 32767
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        group = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        )
+        # Рецепт, где встречались несколько дубликатов, получает одну
+        # строку с суммой количеств, а не несколько строк одного
+        # ингредиента.
+        rows = {}
+        for row in RecipeIngredient.objects.filter(
+            ingredient__in=group
+        ).order_by('recipe_id', 'id'):
+            kept = rows.get(row.recipe_id)
+            if kept is None:
+                rows[row.recipe_id] = row
+                continue
+            kept.amount = min(kept.amount + row.amount, MAX_AMOUNT)
+            row.delete()
+        for row in rows.values():
+            row.ingredient_id = duplicate['keep_id']
+            row.save(update_fields=['ingredient', 'amount'])
+        group.exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_detail',
+            field=models.ImageField(blank=True, editable=False, upload_to='recipes/detail/', verbose_name='Изображение для страницы рецепта'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='recipes/thumbnail/', verbose_name='Миниатюра'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, editable=False, upload_to='recipes/webp/', verbose_name='Изображение WebP'),
+        ),
+    ]
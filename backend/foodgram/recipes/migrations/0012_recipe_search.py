@@ -0,0 +1,71 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:34
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_search_vector_gin '
+        'ON recipes_recipe USING GIN (search_vector)'
+    )
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    names = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    config = settings.SEARCH_CONFIG
+    Recipe.objects.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(names, weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_shopping_list_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipesearchterm',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='recipes.recipe'),
+        ),
+        migrations.AddIndex(
+            model_name='recipesearchterm',
+            index=models.Index(fields=['term', 'recipe'], name='recipe_search_term_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
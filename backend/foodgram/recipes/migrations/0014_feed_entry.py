@@ -0,0 +1,85 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+
+
+def fill_feeds(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    follows = Follow.objects.exclude(
+        author__followers_count__gt=settings.FEED_FANOUT_LIMIT
+    )
+    recent = defaultdict(list)
+    for recipe_id, author_id, pub_date in Recipe.objects.filter(
+        author__in=follows.values('author_id')
+    ).order_by('author_id', '-pub_date', '-id').values_list(
+        'id', 'author_id', 'pub_date'
+    ).iterator():
+        if len(recent[author_id]) < settings.FEED_BACKFILL_SIZE:
+            recent[author_id].append((recipe_id, pub_date))
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id, author_id in follows.values_list(
+                'user_id', 'author_id'
+            ).iterator()
+            for recipe_id, pub_date in recent[author_id]
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0003_counters'),
+        ('recipes', '0013_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:45
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_carts(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = list(ShoppingCart.objects.values(
+        'user_id', 'recipe_id'
+    ).annotate(
+        first_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by())
+    if not duplicates:
+        return
+    for row in duplicates:
+        ShoppingCart.objects.filter(
+            user_id=row['user_id'], recipe_id=row['recipe_id']
+        ).exclude(id=row['first_id']).delete()
+    users = {row['user_id'] for row in duplicates}
+    recipes = {row['recipe_id'] for row in duplicates}
+    Recipe.objects.filter(id__in=recipes).update(in_carts_count=Coalesce(
+        Subquery(
+            ShoppingCart.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        Value(0),
+    ))
+    ShoppingListItem.objects.filter(user_id__in=users).delete()
+    totals = RecipeIngredient.objects.filter(
+        recipe__recipe_in_cart__user_id__in=users
+    ).values(
+        'recipe__recipe_in_cart__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=row['recipe__recipe_in_cart__user_id'],
+                ingredient_id=row['ingredient_id'],
+                amount=row['total'],
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_feed_entry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(fields=['tag', 'recipe'], name='recipe_tag_tag_recipe_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart'),
+        ),
+    ]
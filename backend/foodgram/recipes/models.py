@@ -1,13 +1,22 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
-from users.models import User
+from users.models import Follow, User
 
 
 class Ingredient(models.Model):
     name = models.CharField('Название ингредиента', max_length=200)
     measurement_unit = models.CharField('Единица измерения', max_length=32)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
+
     def __str__(self):
         return self.name
 
@@ -21,6 +30,33 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Аннотирует флаги избранного, корзины и подписки на автора."""
+        if not user.is_authenticated:
+            false = models.Value(False, output_field=models.BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                is_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user,
+                recipe=models.OuterRef('pk'),
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user,
+                recipe=models.OuterRef('pk'),
+            )),
+            is_subscribed=models.Exists(Follow.objects.filter(
+                user=user,
+                author=models.OuterRef('author'),
+            )),
+        )
+
+
 class Recipe(models.Model):
     name = models.CharField('Название рецепта',
                             max_length=200)
@@ -28,6 +64,21 @@ class Recipe(models.Model):
     image = models.ImageField('Изображение',
                               upload_to='recipes/image/',
                               )
+    image_thumbnail = models.ImageField('Миниатюра',
+                                        upload_to='recipes/thumbnail/',
+                                        blank=True,
+                                        editable=False,
+                                        )
+    image_detail = models.ImageField('Изображение для страницы рецепта',
+                                     upload_to='recipes/detail/',
+                                     blank=True,
+                                     editable=False,
+                                     )
+    image_webp = models.ImageField('Изображение WebP',
+                                   upload_to='recipes/webp/',
+                                   blank=True,
+                                   editable=False,
+                                   )
     cooking_time = (
         models.PositiveSmallIntegerField(
             'Время приготовления',
@@ -59,9 +110,36 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Число добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Число добавлений в корзину',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['text', 'author'],
@@ -73,6 +151,27 @@ class Recipe(models.Model):
         return self.name
 
 
+class RecipeSearchTerm(models.Model):
+    """Слово из рецепта для поиска на базах без полнотекстового индекса."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    term = models.CharField('Слово', max_length=64)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['term', 'recipe'],
+                name='recipe_search_term_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} содержит слово {self.term}'
+
+
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(Recipe,
                                on_delete=models.CASCADE,
@@ -108,6 +207,14 @@ class RecipeTag(models.Model):
         related_name='tag_recipe',
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['tag', 'recipe'],
+                name='recipe_tag_tag_recipe_idx',
+            ),
+        ]
+
     def __str__(self):
         return f'{self.recipe} имеет тег {self.tag}'
 
@@ -158,3 +265,70 @@ class ShoppingCart(models.Model):
 
     def __str__(self) -> str:
         return f'{self.recipe} в корзине у {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    amount = models.IntegerField('Количество')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.ingredient} в списке покупок у {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт автора в ленте подписчика, записанный при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe} в ленте у {self.user}'
@@ -0,0 +1,97 @@
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery
+
+from .models import Recipe, RecipeIngredient, RecipeSearchTerm
+
+TOKEN = re.compile(r'\w+')
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+BATCH_SIZE = 1000
+
+
+def use_full_text():
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(value):
+    return {
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN.findall(value.casefold())
+        if len(token) >= MIN_TERM_LENGTH
+    }
+
+
+def ingredient_names():
+    return Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+
+
+def update_search_index(recipe_ids=None):
+    """Обновляет поисковый индекс рецептов (всех, если id не заданы).
+
+    На PostgreSQL пересчитывается столбец search_vector одним UPDATE,
+    на остальных базах - таблица слов RecipeSearchTerm.
+    """
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    if use_full_text():
+        config = settings.SEARCH_CONFIG
+        return recipes.update(search_vector=(
+            SearchVector('name', weight='A', config=config)
+            + SearchVector(ingredient_names(), weight='B', config=config)
+            + SearchVector('text', weight='C', config=config)
+        ))
+    terms = RecipeSearchTerm.objects.all()
+    if recipe_ids is not None:
+        terms = terms.filter(recipe_id__in=recipe_ids)
+    terms.delete()
+    names = defaultdict(list)
+    for recipe_id, name in RecipeIngredient.objects.filter(
+        recipe__in=recipes
+    ).values_list('recipe_id', 'ingredient__name').iterator():
+        names[recipe_id].append(name)
+    rows = []
+    for pk, name, text in recipes.values_list(
+        'pk', 'name', 'text'
+    ).iterator():
+        rows.extend(
+            RecipeSearchTerm(recipe_id=pk, term=term)
+            for term in tokenize(' '.join([name, text, *names[pk]]))
+        )
+    RecipeSearchTerm.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по поисковому запросу.
+
+    На PostgreSQL результат ранжируется по SearchRank через GIN-индекс.
+    На остальных базах каждое слово запроса ищется как префикс по
+    индексу RecipeSearchTerm, без ранжирования.
+    """
+    if use_full_text():
+        search_query = SearchQuery(
+            query, search_type='websearch', config=settings.SEARCH_CONFIG
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+    for token in tokenize(query):
+        queryset = queryset.filter(pk__in=RecipeSearchTerm.objects.filter(
+            term__gte=token,
+            term__lt=token + chr(0x10FFFF),
+        ).values('recipe_id'))
+    return queryset
@@ -0,0 +1,117 @@
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def apply_deltas(user_ids, deltas):
+    """Прибавляет к спискам покупок пользователей изменения количеств.
+
+    deltas - словарь {ingredient_id: изменение}. Недостающие строки
+    создаются с нулём, затем все суммы меняются одним UPDATE, а строки,
+    ушедшие в ноль, удаляются.
+    """
+    deltas = {
+        ingredient: delta for ingredient, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(user_id=user, ingredient_id=ingredient, amount=0)
+            for user in user_ids
+            for ingredient in deltas
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids,
+        ingredient_id__in=deltas,
+    )
+    items.update(amount=F('amount') + Case(
+        *(
+            When(ingredient_id=ingredient, then=Value(delta))
+            for ingredient, delta in deltas.items()
+        ),
+        default=Value(0),
+    ))
+    items.filter(amount__lte=0).delete()
+
+
+def recipe_amounts(recipe_id):
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount'))
+
+
+def total_amounts(recipe_ids):
+    """Суммы ингредиентов по нескольким рецептам одним запросом."""
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('ingredient_id').annotate(
+        total=Sum('amount')
+    ).order_by().values_list('ingredient_id', 'total'))
+
+
+def add_recipe(user_id, recipe_id):
+    apply_deltas([user_id], recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    apply_deltas([user_id], {
+        ingredient: -amount
+        for ingredient, amount in recipe_amounts(recipe_id).items()
+    })
+
+
+def add_recipes(user_id, recipe_ids):
+    if recipe_ids:
+        apply_deltas([user_id], total_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    if recipe_ids:
+        apply_deltas([user_id], {
+            ingredient: -amount
+            for ingredient, amount in total_amounts(recipe_ids).items()
+        })
+
+
+def change_recipe(recipe_id, deltas):
+    """Переносит правку ингредиентов рецепта во все корзины с ним."""
+    if not any(deltas.values()):
+        return
+    apply_deltas(
+        list(ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)),
+        deltas,
+    )
+
+
+def rebuild(user_ids=None):
+    """Пересобирает списки покупок из корзин с нуля."""
+    items = ShoppingListItem.objects.all()
+    totals = RecipeIngredient.objects.filter(
+        recipe__recipe_in_cart__isnull=False
+    )
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+        totals = totals.filter(recipe__recipe_in_cart__user_id__in=user_ids)
+    items.delete()
+    totals = totals.values(
+        'recipe__recipe_in_cart__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+    return len(ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=row['recipe__recipe_in_cart__user_id'],
+                ingredient_id=row['ingredient_id'],
+                amount=row['total'],
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    ))
@@ -0,0 +1,135 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from foodgram.versions import (AUTH_VERSION, INGREDIENTS_VERSION,
+                               RECIPES_VERSION, TAGS_VERSION, USERS_VERSION,
+                               bump_version)
+from users.models import Follow, User
+
+from . import feed
+from .counters import COUNTERS, change_counter
+from .models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from .search import update_search_index
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(**kwargs):
+    transaction.on_commit(partial(bump_version, INGREDIENTS_VERSION))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=RecipeTag)
+def recipe_changed(**kwargs):
+    transaction.on_commit(partial(bump_version, RECIPES_VERSION))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, **kwargs):
+    # Ингредиенты рецепта пишутся bulk-операциями уже после save(),
+    # поэтому индекс пересчитывается после коммита.
+    transaction.on_commit(partial(update_search_index, [instance.pk]))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created=False, **kwargs):
+    if created:
+        feed.schedule_fan_out(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(instance, created=False, **kwargs):
+    if created:
+        # После коммита счётчик подписчиков уже учитывает эту подписку.
+        transaction.on_commit(partial(
+            feed.backfill, instance.user_id, instance.author_id
+        ))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(instance, **kwargs):
+    feed.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(instance, created=False, **kwargs):
+    if created:
+        return
+    transaction.on_commit(partial(
+        update_search_index,
+        list(instance.ingredient_recipe.values_list('recipe_id', flat=True))
+    ))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(**kwargs):
+    transaction.on_commit(partial(bump_version, TAGS_VERSION))
+
+
+# Поля пользователя в ответах API (автор рецепта, списки пользователей).
+USER_FIELDS = ('email', 'username', 'first_name', 'last_name')
+# Поля, от которых зависит результат проверки токена.
+AUTH_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser')
+
+
+@receiver(post_init, sender=User)
+def user_loaded(instance, **kwargs):
+    # Значения, с которыми строка прочитана; отложенные поля не читаются.
+    instance._saved_fields = {
+        field: instance.__dict__[field]
+        for field in (*USER_FIELDS, *AUTH_FIELDS)
+        if field in instance.__dict__
+    }
+
+
+def changed_fields(instance, fields):
+    """Изменилось ли одно из полей с момента чтения строки.
+
+    Поле, которого при чтении не было (отложенное), считается изменённым.
+    """
+    saved = instance._saved_fields
+    return any(
+        field in instance.__dict__
+        and (field not in saved or saved[field] != instance.__dict__[field])
+        for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(instance, created=False, **kwargs):
+    if created or changed_fields(instance, USER_FIELDS):
+        transaction.on_commit(partial(bump_version, USERS_VERSION))
+    if not created and changed_fields(instance, AUTH_FIELDS):
+        transaction.on_commit(partial(bump_version, AUTH_VERSION))
+    user_loaded(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(**kwargs):
+    transaction.on_commit(partial(bump_version, USERS_VERSION))
+    transaction.on_commit(partial(bump_version, AUTH_VERSION))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(**kwargs):
+    transaction.on_commit(partial(bump_version, AUTH_VERSION))
+
+
+def update_counters(sender, instance, signal, created=False, **kwargs):
+    if signal is post_save and not created:
+        return
+    delta = 1 if signal is post_save else -1
+    for model, field, related, lookup in COUNTERS:
+        if related is sender:
+            change_counter(
+                model, getattr(instance, f'{lookup}_id'), field, delta
+            )
+
+
+for _, _, related, _ in COUNTERS:
+    post_save.connect(update_counters, sender=related)
+    post_delete.connect(update_counters, sender=related)
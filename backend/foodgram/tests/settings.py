@@ -0,0 +1,19 @@
+"""Настройки тестов: основная база и реплика - пара файлов SQLite.
+
+Реплика - зеркало default (TEST MIRROR), как потоковая реплика
+PostgreSQL, но со своим соединением: по нему видно, куда ушёл запрос.
+"""
+from foodgram.settings import *  # noqa: F401,F403
+from foodgram.settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes import batch, shopping_list
+from recipes.counters import repair_counters
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+from users.authentication import token_cache
+from users.models import User
+
+from .utils import api_client, generate_data
+
+MISSING_ID = 10 ** 9
+
+
+class BatchRecipesTests(TestCase):
+    """Пакетное избранное и корзина: статусы, счётчики, список покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_data(users=3, recipes=10, follows=0, favorites=0, cart=0)
+        cls.user = User.objects.first()
+        cls.recipes = list(Recipe.objects.values_list('id', flat=True)[:4])
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = api_client(self.user)
+
+    def send(self, method, url, recipe_ids):
+        response = getattr(self.client, method)(
+            url, {'recipes': recipe_ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return [item['status'] for item in response.data['recipes']]
+
+    def assert_counters_consistent(self):
+        self.assertEqual(set(repair_counters().values()), {0})
+
+    def test_favorite_statuses_and_counters(self):
+        url = '/api/recipes/favorite/'
+        first, second, *_ = self.recipes
+        self.assertEqual(
+            self.send('post', url, [first, first, MISSING_ID]),
+            [batch.ADDED, batch.NOT_FOUND],
+        )
+        self.assertEqual(
+            self.send('post', url, [first, second]),
+            [batch.EXISTS, batch.ADDED],
+        )
+        self.assert_counters_consistent()
+        self.assertEqual(
+            self.send('delete', url, [first, MISSING_ID]),
+            [batch.REMOVED, batch.NOT_FOUND],
+        )
+        self.assertEqual(
+            self.send('delete', url, [first, second]),
+            [batch.MISSING, batch.REMOVED],
+        )
+        self.assert_counters_consistent()
+        self.assertFalse(Favorite.objects.filter(user=self.user).exists())
+
+    def test_shopping_cart_keeps_list_in_sync(self):
+        url = '/api/recipes/shopping_cart/'
+        self.send('post', url, self.recipes)
+        self.send('delete', url, self.recipes[:2])
+        self.assert_counters_consistent()
+        items = set(ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ))
+        shopping_list.rebuild()
+        self.assertEqual(items, set(ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        )))
+
+    def test_insert_returns_only_new_rows(self):
+        # Строку уже вставил конкурентный запрос: её не считаем.
+        first, second, *_ = self.recipes
+        ShoppingCart.objects.create(user=self.user, recipe_id=first)
+        self.assertEqual(
+            batch.insert_recipes(ShoppingCart, self.user, [first, second]),
+            {second},
+        )
+        self.assertEqual(
+            ShoppingCart.objects.filter(user=self.user).count(), 2
+        )
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.catalog import tag_catalog
+from recipes.models import Ingredient, Recipe
+from users.authentication import token_cache
+from users.models import User
+
+
+class RecipeConditionalGetTests(TestCase):
+    """304 для карточки рецепта не скрывает смену флагов пользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        )
+        call_command(
+            'generate_data', users=3, recipes=5, follows=0, favorites=0,
+            cart=0, seed=1, stdout=StringIO(),
+        )
+        cls.recipe = Recipe.objects.first()
+        cls.user = User.objects.exclude(pk=cls.recipe.author_id).first()
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        tag_catalog.get_state()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_authenticated_detail_has_no_last_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_if_modified_since_after_favorite(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.data['is_favorited'])
+        since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.client.post(f'{self.url}favorite/')
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_etag_changes_after_shopping_cart(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code,
+            304,
+        )
+        self.client.post(f'{self.url}shopping_cart/')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_in_shopping_cart'])
+
+    def test_anonymous_detail_keeps_last_modified(self):
+        response = APIClient().get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
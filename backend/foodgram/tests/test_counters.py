@@ -0,0 +1,62 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.counters import (batch_counters, change_counter,
+                              repair_counters)
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+from .utils import generate_data
+
+
+class CounterTests(TestCase):
+    """Счётчики меняются при записи и не уходят ниже нуля."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_data(users=3, recipes=6, follows=0, favorites=0, cart=0)
+        cls.user, cls.author = User.objects.all()[:2]
+        cls.recipe = Recipe.objects.first()
+
+    def count(self, obj, field):
+        return type(obj).objects.values_list(field, flat=True).get(
+            pk=obj.pk
+        )
+
+    def test_favorite_and_cart_counters(self):
+        favorite = Favorite.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        self.assertEqual(self.count(self.recipe, 'favorites_count'), 1)
+        self.assertEqual(self.count(self.recipe, 'in_carts_count'), 1)
+        favorite.delete()
+        self.assertEqual(self.count(self.recipe, 'favorites_count'), 0)
+        self.assertEqual(set(repair_counters().values()), {0})
+
+    def test_follow_and_recipe_counters(self):
+        recipes = self.count(self.author, 'recipes_count')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.count(self.author, 'followers_count'), 1)
+        Recipe.objects.filter(author=self.author).first().delete()
+        self.assertEqual(
+            self.count(self.author, 'recipes_count'), recipes - 1
+        )
+
+    def test_counter_stays_non_negative(self):
+        favorite = Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=0)
+        favorite.delete()
+        self.assertEqual(self.count(self.recipe, 'favorites_count'), 0)
+        change_counter(Recipe, self.recipe.pk, 'favorites_count', -3)
+        self.assertEqual(self.count(self.recipe, 'favorites_count'), 0)
+
+    def test_batch_counters_fold_updates(self):
+        recipes = list(Recipe.objects.all()[:3])
+        with CaptureQueriesContext(connection) as context:
+            with batch_counters():
+                for recipe in recipes:
+                    change_counter(Recipe, recipe.pk, 'favorites_count', 1)
+                self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(len(context.captured_queries), 1)
+        for recipe in recipes:
+            self.assertEqual(self.count(recipe, 'favorites_count'), 1)
@@ -0,0 +1,144 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram.db_router import set_replica_reads, use_primary
+from recipes.models import Tag
+from users.authentication import token_cache
+from users.models import User
+
+REPLICA = 'replica1'
+
+
+class QueryLog:
+    """Запросы к основной базе и к реплике внутри блока with."""
+
+    def __enter__(self):
+        self.contexts = {
+            alias: CaptureQueriesContext(connections[alias])
+            for alias in ('default', REPLICA)
+        }
+        for context in self.contexts.values():
+            context.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        for context in self.contexts.values():
+            context.__exit__(*exc_info)
+
+    def count(self, alias):
+        return len(self.contexts[alias].captured_queries)
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    """Маршрутизация запросов ReplicaRouter между default и репликой."""
+
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+
+    def test_reads_go_to_replica(self):
+        with set_replica_reads(True), QueryLog() as log:
+            self.assertEqual(Tag.objects.get(pk=self.tag.pk), self.tag)
+        self.assertEqual(log.count(REPLICA), 1)
+        self.assertEqual(log.count('default'), 0)
+
+    def test_reads_without_permission_go_to_default(self):
+        self.assertEqual(Tag.objects.all().db, 'default')
+        with set_replica_reads(True), use_primary():
+            self.assertEqual(Tag.objects.all().db, 'default')
+
+    def test_reads_in_transaction_go_to_default(self):
+        with set_replica_reads(True):
+            self.assertEqual(Tag.objects.all().db, REPLICA)
+            with transaction.atomic():
+                self.assertEqual(Tag.objects.all().db, 'default')
+
+    def test_writes_go_to_default(self):
+        with set_replica_reads(True), QueryLog() as log:
+            Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+            self.assertEqual(router.db_for_write(Tag), 'default')
+        self.assertEqual(log.count(REPLICA), 0)
+        self.assertGreater(log.count('default'), 0)
+
+    def test_reads_after_write_go_to_default(self):
+        with set_replica_reads(True):
+            self.tag.save()
+            self.assertEqual(Tag.objects.all().db, 'default')
+
+    def test_select_for_update_goes_to_default(self):
+        with set_replica_reads(True):
+            self.assertEqual(Tag.objects.select_for_update().db, 'default')
+
+    def test_migrations_only_on_default(self):
+        self.assertTrue(router.allow_migrate('default', 'recipes'))
+        self.assertFalse(router.allow_migrate(REPLICA, 'recipes'))
+        self.assertFalse(router.allow_migrate_model(REPLICA, Tag))
+
+
+@override_settings(REPLICA_STICKY_SECONDS=1)
+class ReplicaStickinessTests(TransactionTestCase):
+    """После записи клиент читает с основной базы, пока не истечёт окно."""
+
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        # Новый токен проверяется по основной базе; дальше он в кэше.
+        self.read()
+
+    def read(self):
+        with QueryLog() as log:
+            response = self.client.get(f'/api/users/{self.user.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return log
+
+    def write(self):
+        response = self.client.post(
+            '/api/recipes/favorite/', {'recipes': [1]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_safe_request_reads_from_replica(self):
+        log = self.read()
+        self.assertGreater(log.count(REPLICA), 0)
+        self.assertEqual(log.count('default'), 0)
+
+    def test_reads_stick_to_default_after_write(self):
+        self.write()
+        self.client.cookies.clear()
+        log = self.read()
+        self.assertEqual(log.count(REPLICA), 0)
+        self.assertGreater(log.count('default'), 0)
+
+    def test_cookie_sticks_to_default(self):
+        self.write()
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, self.client.cookies)
+        self.client.credentials()
+        with QueryLog() as log:
+            self.client.get('/api/users/')
+        self.assertEqual(log.count(REPLICA), 0)
+
+    def test_reads_return_to_replica_after_window(self):
+        self.write()
+        self.client.cookies.clear()
+        time.sleep(settings.REPLICA_STICKY_SECONDS + 0.1)
+        log = self.read()
+        self.assertGreater(log.count(REPLICA), 0)
+        self.assertEqual(log.count('default'), 0)
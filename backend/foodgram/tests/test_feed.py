@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from recipes.models import FeedEntry, Recipe
+from users.authentication import token_cache
+from users.models import Follow, User
+
+from .utils import api_client, generate_data
+
+
+@override_settings(FEED_FANOUT_ASYNC=False, FEED_FANOUT_LIMIT=1)
+class FeedTests(TestCase):
+    """Раскладка, отписка и слияние с рецептами популярных авторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_data(users=5, recipes=20, follows=0, favorites=0, cart=0)
+        cls.author, cls.reader, cls.other = User.objects.filter(
+            recipes__isnull=False
+        ).distinct()[:3]
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = api_client(self.reader)
+
+    def follow(self, user, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api_client(user).post(
+                f'/api/users/{author.pk}/subscribe/'
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def feed_ids(self):
+        ids, url = [], '/api/recipes/feed/?limit=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def expected_ids(self, *authors):
+        return list(Recipe.objects.filter(author__in=authors).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+
+    def publish(self, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Recipe.objects.create(
+                author=author, name='Новый', text='Новый рецепт',
+                cooking_time=10,
+            )
+
+    def test_follow_backfills_and_publish_fans_out(self):
+        self.follow(self.reader, self.author)
+        self.assertEqual(self.feed_ids(), self.expected_ids(self.author))
+        recipe = self.publish(self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, recipe=recipe
+        ).exists())
+        self.assertEqual(self.feed_ids()[0], recipe.pk)
+
+    def test_unfollow_trims_feed(self):
+        self.follow(self.reader, self.author)
+        response = self.client.delete(
+            f'/api/users/{self.author.pk}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_follow_past_limit_reads_fresh_counter(self):
+        self.follow(self.other, self.author)
+        # Вторая подписка делает автора популярным (2 > 1): ленту не
+        # заполняем, рецепты читаются напрямую.
+        self.follow(self.reader, self.author)
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_ids(), self.expected_ids(self.author))
+        recipe = self.publish(self.author)
+        self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+        self.assertEqual(self.feed_ids()[0], recipe.pk)
+
+    def test_merge_without_duplicates(self):
+        self.follow(self.reader, self.author)
+        self.follow(self.reader, self.other)
+        # Автор стал популярным, записи FeedEntry остались с прошлого.
+        User.objects.filter(pk=self.author.pk).update(followers_count=5)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, author=self.author
+        ).exists())
+        self.assertEqual(
+            self.feed_ids(), self.expected_ids(self.author, self.other)
+        )
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 2
+        )
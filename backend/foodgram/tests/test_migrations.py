@@ -0,0 +1,69 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeDuplicateIngredientsTests(TransactionTestCase):
+    """0008_unique_ingredient сливает дубликаты без повторов в рецепте."""
+
+    migrate_from = [('recipes', '0007_recipe_pub_date_id_idx')]
+    migrate_to = [('recipes', '0008_unique_ingredient')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        # Остальные приложения остаются на последних миграциях.
+        nodes = [
+            node for node in executor.loader.graph.leaf_nodes()
+            if node[0] != 'recipes'
+        ]
+        return executor.loader.project_state([*targets, *nodes]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_recipe_with_two_duplicates_gets_one_row(self):
+        apps = self.migrate(self.migrate_from)
+        User = apps.get_model('users', 'User')
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        Recipe = apps.get_model('recipes', 'Recipe')
+        RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+        author = User.objects.create(username='cook', email='c@example.com')
+        salt, salt_copy, sugar = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'соль', 'сахар')
+        )
+        both, single = (
+            Recipe.objects.create(
+                author=author, name=name, text=name, cooking_time=1
+            )
+            for name in ('Оба', 'Копия')
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=both, ingredient=salt, amount=5),
+            RecipeIngredient(recipe=both, ingredient=salt_copy, amount=7),
+            RecipeIngredient(recipe=both, ingredient=sugar, amount=1),
+            RecipeIngredient(recipe=single, ingredient=salt_copy, amount=3),
+        ])
+
+        apps = self.migrate(self.migrate_to)
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+        self.assertEqual(
+            list(Ingredient.objects.filter(name='соль').values_list(
+                'id', flat=True
+            )),
+            [salt.id],
+        )
+        self.assertEqual(
+            sorted(RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id', 'amount'
+            )),
+            sorted([
+                (both.id, salt.id, 12),
+                (both.id, sugar.id, 1),
+                (single.id, salt.id, 3),
+            ]),
+        )
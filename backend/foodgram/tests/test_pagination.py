@@ -0,0 +1,85 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.models import Recipe
+from users.authentication import token_cache
+from users.models import User
+
+from .utils import api_client, generate_data
+
+
+def make_cursor(position, reverse=False):
+    return base64.urlsafe_b64encode(
+        json.dumps({'p': position, 'r': reverse}).encode()
+    ).decode()
+
+
+class CursorPaginationTests(TestCase):
+    """Курсорный режим отдаёт те же рецепты, что и постраничный."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_data(users=4, recipes=23, follows=0, favorites=0, cart=0)
+        cls.user = User.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = api_client(self.user)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        return [item['id'] for item in response.data['results']]
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            ids += self.ids(response)
+            pages.append(response.data)
+            url = response.data['next']
+        return ids, pages
+
+    def test_forward_matches_ordering(self):
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+        ids, pages = self.walk('/api/recipes/?limit=5&cursor=')
+        self.assertEqual(ids, expected)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+    def test_previous_returns_earlier_page(self):
+        first = self.client.get('/api/recipes/?limit=5&cursor=')
+        second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+        self.assertEqual(
+            self.ids(self.client.get(third.data['previous'])),
+            self.ids(second),
+        )
+
+    def test_exact_count(self):
+        response = self.client.get('/api/recipes/?cursor=&count=exact')
+        self.assertEqual(response.data['count'], Recipe.objects.count())
+
+    def test_invalid_cursors_are_not_found(self):
+        recipe = Recipe.objects.first()
+        for cursor in (
+            'not-base64!',
+            make_cursor([recipe.pub_date.isoformat()]),
+            make_cursor(['yesterday', recipe.id]),
+            make_cursor([recipe.pub_date.isoformat(), 'one']),
+            make_cursor([None, recipe.id]),
+            make_cursor({'pub_date': 1}),
+        ):
+            response = self.client.get(f'/api/recipes/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_users_cursor(self):
+        ids, _ = self.walk('/api/users/?limit=2&cursor=')
+        self.assertEqual(
+            ids, list(User.objects.order_by('id').values_list('id', flat=True))
+        )
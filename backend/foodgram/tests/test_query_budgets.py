@@ -0,0 +1,74 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram.middleware import QueryBudgetExceeded
+from recipes.catalog import tag_catalog
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe
+from users.authentication import token_cache
+from users.models import Follow, User
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """Эндпоинты укладываются в QUERY_BUDGETS в строгом режиме."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(30)
+        )
+        call_command(
+            'generate_data', users=10, recipes=60, follows=3, favorites=5,
+            cart=3, seed=1, stdout=StringIO(),
+        )
+        cls.user = User.objects.get(
+            pk=Follow.objects.values_list('user', flat=True).first()
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.recipe = Recipe.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        # Справочники строятся один раз на процесс и в бюджет не входят,
+        # проверка токена - входит.
+        tag_catalog.get_state()
+        ingredient_index.get_state()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assert_within_budget(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_recipe_list(self):
+        self.assert_within_budget('/api/recipes/')
+        self.assert_within_budget('/api/recipes/?limit=10&cursor=')
+
+    def test_recipe_detail(self):
+        self.assert_within_budget(f'/api/recipes/{self.recipe.pk}/')
+
+    def test_subscriptions(self):
+        self.assert_within_budget('/api/users/subscriptions/')
+        self.assert_within_budget(
+            '/api/users/subscriptions/?recipes_limit=2'
+        )
+
+    def test_feed_and_catalog(self):
+        self.assert_within_budget('/api/recipes/feed/')
+        self.assert_within_budget('/api/tags/')
+        self.assert_within_budget('/api/ingredients/')
+
+    def test_overrun_raises(self):
+        budgets = {**settings.QUERY_BUDGETS, 'RecipeViewSet.list': 1}
+        with override_settings(QUERY_BUDGETS=budgets):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/recipes/')
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag
+from users.authentication import token_cache
+
+from .utils import api_client, generate_data
+
+
+class RecipeDiffUpdateTests(TestCase):
+    """Правка рецепта пишет только изменившиеся ингредиенты и теги."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_data(users=2, recipes=3, follows=0, favorites=0, cart=0)
+        cls.recipe = Recipe.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = api_client(self.recipe.author)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def rows(self):
+        return {
+            row.ingredient_id: (row.pk, row.amount)
+            for row in RecipeIngredient.objects.filter(recipe=self.recipe)
+        }
+
+    def patch(self, data):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            query['sql'] for query in context.captured_queries
+            if 'recipes_recipeingredient' in query['sql']
+            or 'recipes_recipetag' in query['sql']
+        ]
+
+    def ingredients(self, rows):
+        return [
+            {'id': ingredient, 'amount': amount}
+            for ingredient, (_, amount) in rows.items()
+        ]
+
+    def test_same_ingredients_and_tags_write_nothing(self):
+        tags = list(RecipeTag.objects.filter(
+            recipe=self.recipe
+        ).values_list('tag_id', flat=True))
+        queries = self.patch({
+            'ingredients': self.ingredients(self.rows()), 'tags': tags,
+        })
+        self.assertFalse([
+            sql for sql in queries
+            if sql.startswith(('INSERT', 'DELETE', 'UPDATE'))
+        ])
+
+    def test_changed_amount_updates_row_in_place(self):
+        before = self.rows()
+        changed, *_ = before
+        ingredients = self.ingredients(before)
+        ingredients[0]['amount'] += 1
+        new = Ingredient.objects.exclude(id__in=before).first()
+        dropped = ingredients.pop()
+        ingredients.append({'id': new.id, 'amount': 4})
+        queries = self.patch({'ingredients': ingredients})
+        after = self.rows()
+        self.assertEqual(after[changed], (
+            before[changed][0], before[changed][1] + 1
+        ))
+        self.assertNotIn(dropped['id'], after)
+        self.assertEqual(after[new.id][1], 4)
+        for ingredient, (pk, amount) in before.items():
+            if ingredient not in (changed, dropped['id']):
+                self.assertEqual(after[ingredient], (pk, amount))
+        self.assertEqual(
+            sum(sql.startswith('INSERT') for sql in queries), 1
+        )
+        self.assertEqual(
+            sum(sql.startswith('DELETE') for sql in queries), 1
+        )
@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes import shopping_list
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem)
+from users.authentication import token_cache
+from users.models import User
+
+from .utils import api_client, generate_data
+
+
+class ShoppingListTests(TestCase):
+    """ShoppingListItem после каждой правки совпадает с пересборкой."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_data(
+            users=4, recipes=12, follows=0, favorites=0, cart=3,
+        )
+        cls.user = User.objects.filter(
+            user_recipe_cart__isnull=False
+        ).distinct().first()
+        cls.recipe = Recipe.objects.exclude(
+            recipe_in_cart__user=cls.user
+        ).exclude(author=cls.user).first()
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = api_client(self.user)
+        self.url = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+
+    def assert_matches_rebuild(self):
+        items = set(ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ))
+        shopping_list.rebuild()
+        self.assertEqual(items, set(ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        )))
+        self.assertFalse(ShoppingListItem.objects.filter(
+            amount__lte=0
+        ).exists())
+
+    def test_add_to_cart(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 201)
+        self.assert_matches_rebuild()
+
+    def test_remove_from_cart(self):
+        self.client.post(self.url)
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 204)
+        self.assert_matches_rebuild()
+
+    def test_remove_missing_recipe_is_noop(self):
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 204)
+        self.assert_matches_rebuild()
+        favorite = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.assertEqual(self.client.delete(favorite).status_code, 204)
+
+    def test_edit_ingredients_of_carted_recipe(self):
+        self.client.post(self.url)
+        current = dict(RecipeIngredient.objects.filter(
+            recipe=self.recipe
+        ).values_list('ingredient_id', 'amount'))
+        kept, *dropped = current
+        new = Ingredient.objects.exclude(id__in=current).first()
+        ingredients = [
+            {'id': kept, 'amount': current[kept] + 5},
+            {'id': new.id, 'amount': 2},
+        ]
+        response = api_client(self.recipe.author).patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            {'ingredients': ingredients},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assert_matches_rebuild()
+
+    def test_delete_carted_recipe(self):
+        self.client.post(self.url)
+        self.assertTrue(
+            ShoppingCart.objects.filter(recipe=self.recipe).exists()
+        )
+        response = api_client(self.recipe.author).delete(
+            f'/api/recipes/{self.recipe.pk}/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_matches_rebuild()
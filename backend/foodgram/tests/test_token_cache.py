@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from users.authentication import token_cache
+from users.models import User
+
+from .utils import api_client
+
+
+class TokenRevocationTests(TestCase):
+    """Закэшированный токен перестаёт работать после отзыва."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass'
+        )
+        self.client = api_client(self.user)
+        self.me = '/api/users/me/'
+        # Первый запрос кладёт токен в кэш.
+        self.assertEqual(self.client.get(self.me).status_code, 200)
+
+    def test_cached_token_skips_database(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(self.me).status_code, 200)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'authtoken_token' in query['sql']
+        ])
+
+    def test_logout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(self.me).status_code, 401)
+
+    def test_deactivation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.me).status_code, 401)
+
+    def test_profile_edit_keeps_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.last_name = 'Петров'
+            self.user.save()
+        self.assertEqual(len(token_cache._entries), 1)
+        self.assertEqual(self.client.get(self.me).status_code, 200)
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from foodgram.versions import AUTH_VERSION, USERS_VERSION, get_version
+from users.models import User
+
+
+class UserVersionTests(TestCase):
+    """Сохранение пользователя поднимает только версии изменённых данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass',
+            first_name='Иван', last_name='Петров',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def save(self, user, **kwargs):
+        versions = [get_version(AUTH_VERSION), get_version(USERS_VERSION)]
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(**kwargs)
+        return [
+            old != new for old, new in zip(versions, (
+                get_version(AUTH_VERSION), get_version(USERS_VERSION)
+            ))
+        ]
+
+    def test_last_login_changes_nothing(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = user.date_joined
+        self.assertEqual(
+            self.save(user, update_fields=['last_login']), [False, False]
+        )
+
+    def test_unchanged_save_changes_nothing(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(self.save(user), [False, False])
+
+    def test_profile_edit_changes_users_only(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Пётр'
+        self.assertEqual(self.save(user), [False, True])
+
+    def test_password_changes_auth_only(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-pass')
+        self.assertEqual(self.save(user), [True, False])
+
+    def test_deactivation_changes_auth(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        self.assertEqual(self.save(user), [True, False])
+
+    def test_deferred_field_counts_as_changed(self):
+        user = User.objects.only('pk').get(pk=self.user.pk)
+        user.email = 'cook@example.org'
+        self.assertEqual(self.save(user), [False, True])
@@ -0,0 +1,26 @@
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient
+
+
+def generate_data(ingredients=30, **options):
+    """Справочник ингредиентов и данные команды generate_data."""
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(ingredients)
+    )
+    call_command(
+        'generate_data', stdout=StringIO(), **{'seed': 1, **options}
+    )
+
+
+def api_client(user):
+    """APIClient с токеном пользователя."""
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
@@ -1,17 +1,23 @@
 from django.contrib import admin
 
+from foodgram.admin import LargeTableAdmin
+
 from .models import Follow, User
 
 
 @admin.register(Follow)
-class PersonAdmin(admin.ModelAdmin):
-    pass
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
 
 
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('email', 'username', 'first_name', 'last_name')
-    list_filter = ('email', 'username')
-    search_fields = ('email', 'username')
+class UserAdmin(LargeTableAdmin):
+    list_display = ('email', 'username', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count')
+    list_filter = ('is_active', 'is_staff')
+    search_fields = ('^email', '^username')
 
 
 admin.site.register(User, UserAdmin)
@@ -0,0 +1,73 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from foodgram.db_router import use_primary
+from foodgram.versions import AUTH_VERSION, get_version
+
+
+class TokenCache:
+    """Ограниченный LRU-кэш token -> (user, token) со сроком жизни.
+
+    Каждая запись помнит версию AUTH_VERSION, при которой была сохранена;
+    после выхода, смены пароля или отключения пользователя версия
+    поднимается, и все записи во всех процессах становятся недействительны.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, token, expires, entry_version = entry
+            if entry_version != version or expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user, token
+
+    def set(self, key, user, token, version):
+        with self._lock:
+            self._entries[key] = (
+                user, token, time.monotonic() + self.ttl, version
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который не ходит в базу на каждый запрос.
+
+    Ошибки и проверки те же, что у TokenAuthentication: в кэш попадают
+    только успешно проверенные токены. Запрос получает копию
+    пользователя, чтобы его изменения не попали в кэш.
+    """
+
+    def authenticate_credentials(self, key):
+        version = get_version(AUTH_VERSION)
+        cached = token_cache.get(key, version)
+        if cached is None:
+            # Только что выданного токена на реплике может ещё не быть.
+            with use_primary():
+                cached = super().authenticate_credentials(key)
+            token_cache.set(key, *cached, version)
+        user, token = cached
+        return copy.copy(user), token
@@ -0,0 +1,198 @@
+import json
+import re
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipe, Tag
+
+from .benchmark_api import Command as BenchmarkCommand
+from .benchmark_api import Rollback, send
+
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk(child)
+
+
+class Command(BenchmarkCommand):
+    """Проверяем планы запросов, которые выполняют эндпоинты API.
+
+    Маршруты те же, что у benchmark_api, плюс списки рецептов с фильтрами
+    и поиском. Каждый SELECT, выполненный при запросе, повторяется через
+    EXPLAIN (ANALYZE, BUFFERS) на PostgreSQL или EXPLAIN QUERY PLAN на
+    SQLite. Отмечаются последовательные чтения больших таблиц в запросах
+    с условием WHERE (полная загрузка справочника без условия - не ошибка)
+    и сортировки, ушедшие на диск (на SQLite - сортировки без индекса).
+    Все изменения откатываются в конце.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='username для авторизации')
+        parser.add_argument('--anonymous', action='store_true')
+        parser.add_argument('--min-rows', default=1000, type=int,
+                            help='Размер таблицы, с которого Seq Scan '
+                                 'считается проблемой')
+        parser.add_argument('--strict', action='store_true',
+                            help='Завершиться с ошибкой при находках')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Unsupported database: {connection.vendor}')
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        if recipe is None:
+            raise CommandError('No recipes: run generate_data first')
+        user = self.get_user(options, recipe)
+        self.recipe = recipe
+        self.min_rows = options['min_rows']
+        self.table_sizes = {}
+        self.pks = self.get_pks(recipe)
+        client = Client()
+        if not options['anonymous']:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        results = {}
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        try:
+            with override_settings(ALLOWED_HOSTS=allowed_hosts), (
+                    transaction.atomic()):
+                for name, requests in self.get_audit_scenarios():
+                    results[name] = self.audit(client, requests)
+                raise Rollback
+        except Rollback:
+            pass
+        findings = self.report(results, options['verbosity'])
+        if findings and options['strict']:
+            raise CommandError(f'{findings} plan findings')
+
+    def get_audit_scenarios(self):
+        yield from self.get_scenarios()
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        word = self.recipe.name.split()[0]
+        filters = {
+            'tags': f'tags={tag}',
+            'author': f'author={self.recipe.author_id}',
+            'is_favorited': 'is_favorited=1',
+            'is_in_shopping_cart': 'is_in_shopping_cart=1',
+            'search': f'search={word}',
+        }
+        for name, query in filters.items():
+            yield f'recipes-list-{name}', [('get', f'/api/recipes/?{query}')]
+        yield 'users-subscriptions-recipes_limit', [
+            ('get', '/api/users/subscriptions/?recipes_limit=3')
+        ]
+
+    def audit(self, client, requests):
+        with CaptureQueriesContext(connection) as context:
+            for method, url, *data in requests:
+                response = send(client, method, url, *data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+        plans = {}
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            shape = LITERAL.sub('?', sql)
+            if shape not in plans:
+                plans[shape] = self.explain(sql, ' WHERE ' in sql)
+        return plans
+
+    def explain(self, sql, filtered):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}'
+                )
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plan = plan[0]
+                return {
+                    'sql': sql,
+                    'time_ms': plan['Execution Time'],
+                    'findings': self.postgresql_findings(
+                        plan['Plan'], filtered
+                    ),
+                    'plan': json.dumps(plan['Plan'], indent=2),
+                }
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[3] for row in cursor.fetchall()]
+        return {
+            'sql': sql,
+            'time_ms': None,
+            'findings': self.sqlite_findings(details, filtered),
+            'plan': '\n'.join(details),
+        }
+
+    def postgresql_findings(self, plan, filtered):
+        findings = []
+        for node in walk(plan):
+            if node['Node Type'] == 'Seq Scan' and filtered:
+                rows = (
+                    node['Actual Rows'] + node.get('Rows Removed by Filter', 0)
+                ) * node['Actual Loops']
+                if rows >= self.min_rows:
+                    findings.append(
+                        f'Seq Scan on {node["Relation Name"]} ({rows} rows)'
+                    )
+            if node.get('Sort Space Type') == 'Disk':
+                findings.append(
+                    f'Sort spilled to disk ({node["Sort Method"]}, '
+                    f'{node["Sort Space Used"]} kB)'
+                )
+        return findings
+
+    def sqlite_findings(self, details, filtered):
+        findings = []
+        for detail in details:
+            match = SQLITE_SCAN.match(detail)
+            if match and filtered and ' USING ' not in detail:
+                table = match.group(1)
+                rows = self.get_table_size(table)
+                if rows >= self.min_rows:
+                    findings.append(f'Seq Scan on {table} ({rows} rows)')
+            if detail == 'USE TEMP B-TREE FOR ORDER BY':
+                findings.append('Sort without index')
+        return findings
+
+    def get_table_size(self, table):
+        if table not in self.table_sizes:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                self.table_sizes[table] = cursor.fetchone()[0]
+        return self.table_sizes[table]
+
+    def report(self, results, verbosity):
+        total = 0
+        for name, plans in results.items():
+            flagged = [plan for plan in plans.values() if plan['findings']]
+            total += sum(len(plan['findings']) for plan in flagged)
+            style = self.style.WARNING if flagged else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name}: {len(plans)} queries, {len(flagged)} flagged'
+            ))
+            for plan in plans.values():
+                if not plan['findings'] and verbosity < 2:
+                    continue
+                time = (
+                    f' {plan["time_ms"]:.2f} ms'
+                    if plan['time_ms'] is not None else ''
+                )
+                self.stdout.write(f'  {plan["sql"][:160]}{time}')
+                for finding in plan['findings']:
+                    self.stdout.write(self.style.WARNING(f'    {finding}'))
+                if verbosity >= 2:
+                    self.stdout.write(f'{plan["plan"]}\n')
+        self.stdout.write(f'Findings: {total}')
+        return total
@@ -0,0 +1,198 @@
+import json
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.urls import router
+from recipes.models import Recipe
+from users.models import User
+
+RECIPE_ID_KWARG = re.compile(r'\(\?P<recipe_id>[^)]*\)')
+
+
+class Rollback(Exception):
+    pass
+
+
+def send(client, method, url, data=None):
+    if data is None:
+        return getattr(client, method)(url)
+    return getattr(client, method)(
+        url, data, content_type='application/json'
+    )
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    """Замеряем эндпоинты API через тестовый клиент Django.
+
+    Для каждого маршрута роутера из api/urls.py выполняются GET-запросы
+    к list, retrieve и дополнительным действиям, а для пар POST/DELETE
+    (избранное, корзина, подписка) - добавление и удаление. Все изменения
+    откатываются в конце. Результат можно сохранить как базовый и
+    сравнивать с ним следующие прогоны.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', default=20, type=int,
+                            help='Запросов на маршрут')
+        parser.add_argument('--user', help='username для авторизации')
+        parser.add_argument('--anonymous', action='store_true')
+        parser.add_argument('--baseline', help='Файл базового прогона')
+        parser.add_argument('--save-baseline', help='Сохранить результат')
+        parser.add_argument('--tolerance', default=1.2, type=float,
+                            help='Допустимый рост p95 относительно базы')
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        if recipe is None:
+            raise CommandError('No recipes: run generate_data first')
+        user = self.get_user(options, recipe)
+        self.pks = self.get_pks(recipe)
+        client = Client()
+        if not options['anonymous']:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        results = {}
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        try:
+            with override_settings(ALLOWED_HOSTS=allowed_hosts), (
+                    transaction.atomic()):
+                for name, requests in self.get_scenarios():
+                    results[name] = self.measure(
+                        client, requests, options['requests']
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        self.report(results)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    def get_user(self, options, recipe):
+        if options['user']:
+            try:
+                return User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'No user {options["user"]}')
+        return User.objects.exclude(id=recipe.author_id).first() or (
+            recipe.author
+        )
+
+    def get_pks(self, recipe):
+        pks = {
+            basename: viewset.queryset.values_list('pk', flat=True).first()
+            for _, viewset, basename in router.registry
+        }
+        pks.update(recipes=recipe.id, users=recipe.author_id)
+        return pks
+
+    def build_url(self, prefix, basename, detail=False, url_path=None):
+        url = f'/api/{RECIPE_ID_KWARG.sub(str(self.pks["recipes"]), prefix)}/'
+        if detail:
+            url += f'{self.pks[basename]}/'
+        if url_path:
+            url += f'{url_path}/'
+        return url
+
+    def get_scenarios(self):
+        for prefix, viewset, basename in router.registry:
+            if hasattr(viewset, 'list'):
+                yield f'{basename}-list', [
+                    ('get', self.build_url(prefix, basename))
+                ]
+            if hasattr(viewset, 'retrieve'):
+                yield f'{basename}-detail', [
+                    ('get', self.build_url(prefix, basename, detail=True))
+                ]
+            if hasattr(viewset, 'create') and hasattr(viewset, 'delete'):
+                url = self.build_url(prefix, basename)
+                yield f'{basename}-toggle', [('post', url), ('delete', url)]
+            for action in viewset.get_extra_actions():
+                url = self.build_url(
+                    prefix, basename, action.detail, action.url_path
+                )
+                methods = set(action.mapping)
+                if methods == {'get'}:
+                    yield f'{basename}-{action.url_name}', [('get', url)]
+                elif methods == {'post', 'delete'}:
+                    # Действия над списком рецептов ждут их id в теле.
+                    data = (
+                        None if action.detail
+                        else {'recipes': [self.pks['recipes']]}
+                    )
+                    yield f'{basename}-{action.url_name}-toggle', [
+                        ('post', url, data), ('delete', url, data)
+                    ]
+
+    def measure(self, client, requests, count):
+        timings = []
+        queries = 0
+        statuses = set()
+        started = time.perf_counter()
+        for _ in range(count):
+            for method, url, *data in requests:
+                request_started = time.perf_counter()
+                with CaptureQueriesContext(connection) as context:
+                    response = send(client, method, url, *data)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                timings.append(time.perf_counter() - request_started)
+                queries += len(context.captured_queries)
+                statuses.add(response.status_code)
+        total = time.perf_counter() - started
+        return {
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'queries': round(queries / len(timings), 1),
+            'rps': round(len(timings) / total, 1),
+            'statuses': sorted(statuses),
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"route":45} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"queries":>8} {"req/s":>8}  statuses'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:45} {result["p50_ms"]:8} {result["p95_ms"]:8} '
+                f'{result["queries"]:8} {result["rps"]:8}  '
+                f'{result["statuses"]}'
+            )
+
+    def compare(self, results, path, tolerance):
+        with open(path) as f:
+            baseline = json.load(f)
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f'{name}: queries {base["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            if result['p95_ms'] > base['p95_ms'] * tolerance:
+                regressions.append(
+                    f'{name}: p95 {base["p95_ms"]} -> {result["p95_ms"]} ms'
+                )
+        for regression in regressions:
+            self.stdout.write(self.style.WARNING(regression))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
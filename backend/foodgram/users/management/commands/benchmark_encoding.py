@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer, orjson
+from foodgram.middleware import ENCODINGS
+
+
+def measure(function, argument, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        result = function(argument)
+    return result, (time.process_time() - started) / repeat * 1000
+
+
+class Command(BaseCommand):
+    """Замеряем рендеринг JSON и сжатие ответов API.
+
+    Для каждого пути данные ответа берутся один раз через тестовый
+    клиент, затем многократно рендерятся стандартным JSONRenderer и
+    FastJSONRenderer и сжимаются каждой доступной кодировкой из
+    CompressionMiddleware. Время - процессорное, на один ответ.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=[
+            '/api/recipes/?limit=50', '/api/ingredients/',
+        ])
+        parser.add_argument('--repeat', default=50, type=int)
+
+    def handle(self, *args, **options):
+        client = Client()
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson is not installed: FastJSONRenderer falls back '
+                'to the standard renderer'
+            ))
+        self.stdout.write(
+            f'{"path":32} {"step":18} {"bytes":>10} {"cpu ms":>8}'
+        )
+        for path in options['paths']:
+            with override_settings(ALLOWED_HOSTS=allowed_hosts):
+                response = client.get(path, HTTP_ACCEPT='application/json')
+            if response.status_code != 200:
+                raise CommandError(f'{path}: {response.status_code}')
+            data = response.data
+            for renderer in (JSONRenderer(), FastJSONRenderer()):
+                content, cpu = measure(
+                    renderer.render, data, options['repeat']
+                )
+                self.write(path, type(renderer).__name__, content, cpu)
+            for encoding, compress in ENCODINGS.items():
+                compressed, cpu = measure(
+                    compress, content, options['repeat']
+                )
+                self.write(path, encoding, compressed, cpu)
+
+    def write(self, path, step, content, cpu):
+        self.stdout.write(
+            f'{path[:32]:32} {step:18} {len(content):>10} {cpu:>8.3f}'
+        )
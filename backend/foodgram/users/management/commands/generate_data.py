@@ -0,0 +1,204 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from foodgram.versions import (RECIPES_VERSION, TAGS_VERSION, USERS_VERSION,
+                               bump_version)
+from recipes import feed, shopping_list
+from recipes.counters import repair_counters
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from recipes.search import update_search_index
+from users.models import Follow, User
+
+BATCH_SIZE = 1000
+DEFAULT_TAGS = (
+    ('Завтрак', 'breakfast', '#E26C2D'),
+    ('Обед', 'lunch', '#49B64E'),
+    ('Ужин', 'dinner', '#8775D2'),
+    ('Десерт', 'dessert', '#F2C94C'),
+    ('Выпечка', 'bakery', '#A0522D'),
+    ('Веган', 'vegan', '#2D9CDB'),
+)
+SEED_PASSWORD = 'seed-password'
+SEED_IMAGE = 'recipes/image/1PVrUVlo1zk.jpg'
+PUBLICATION_PERIOD_DAYS = 365
+
+
+class Command(BaseCommand):
+    """Заполняем базу синтетическими пользователями и рецептами.
+
+    Данные создаются пачками через bulk_create и воспроизводимы при
+    одинаковом --seed. Популярность авторов и ингредиентов распределена
+    неравномерно, как на живом сайте.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=100, type=int)
+        parser.add_argument('--recipes', default=1000, type=int)
+        parser.add_argument('--follows', default=10, type=int,
+                            help='Подписок на пользователя')
+        parser.add_argument('--favorites', default=20, type=int,
+                            help='Избранных рецептов на пользователя')
+        parser.add_argument('--cart', default=5, type=int,
+                            help='Рецептов в корзине на пользователя')
+        parser.add_argument('--seed', default=42, type=int)
+        parser.add_argument('--batch-size', default=BATCH_SIZE, type=int)
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists():
+            raise CommandError('Load ingredients first: load_ingredients')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        with transaction.atomic():
+            tags = self.create_tags()
+            users = self.create_users(options['users'], options['seed'])
+            recipes = self.create_recipes(options['recipes'], users, tags)
+            self.create_relations(users, recipes, options)
+            repair_counters()
+            shopping_list.rebuild()
+            feed.rebuild()
+            update_search_index(recipes)
+        for name in (RECIPES_VERSION, TAGS_VERSION, USERS_VERSION):
+            bump_version(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(users)} users and {len(recipes)} recipes'
+        ))
+
+    def skewed_choice(self, population):
+        """Выбор с перекосом в сторону начала списка (закон Ципфа)."""
+        index = int(self.random.paretovariate(1.2)) - 1
+        return population[index % len(population)]
+
+    def create_tags(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, slug=slug, color=color)
+                for name, slug, color in DEFAULT_TAGS
+            )
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_users(self, count, seed):
+        last_id = User.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        password = make_password(SEED_PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'seed{seed}u{number}',
+                    email=f'seed{seed}u{number}@example.com',
+                    first_name=f'Имя{number}',
+                    last_name=f'Фамилия{number}',
+                    password=password,
+                )
+                for number in range(count)
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        users = list(User.objects.filter(id__gt=last_id).values_list(
+            'id', flat=True
+        ))
+        self.stdout.write(f'Users: {len(users)}')
+        return users
+
+    def create_recipes(self, count, users, tags):
+        if not users:
+            return []
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        self.random.shuffle(ingredients)
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        marker = self.random.getrandbits(32)
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=self.skewed_choice(users),
+                    name=f'Рецепт {number}',
+                    text=f'Описание рецепта {marker}-{number}.',
+                    image=SEED_IMAGE,
+                    cooking_time=self.random.randint(5, 180),
+                )
+                for number in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        recipes = list(Recipe.objects.filter(id__gt=last_id))
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=self.random.randint(
+                    0, PUBLICATION_PERIOD_DAYS * 24 * 3600
+                )
+            )
+        Recipe.objects.bulk_update(
+            recipes, ['pub_date'], batch_size=self.batch_size
+        )
+        recipe_ingredients = []
+        recipe_tags = []
+        for recipe in recipes:
+            chosen = {
+                self.skewed_choice(ingredients)
+                for _ in range(self.random.randint(3, 15))
+            }
+            recipe_ingredients.extend(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient,
+                    amount=self.random.randint(1, 500),
+                )
+                for ingredient in chosen
+            )
+            recipe_tags.extend(
+                RecipeTag(recipe=recipe, tag_id=tag)
+                for tag in self.random.sample(
+                    tags, self.random.randint(1, min(3, len(tags)))
+                )
+            )
+        RecipeIngredient.objects.bulk_create(
+            recipe_ingredients, batch_size=self.batch_size
+        )
+        RecipeTag.objects.bulk_create(
+            recipe_tags, batch_size=self.batch_size
+        )
+        self.stdout.write(f'Recipes: {len(recipes)}')
+        return [recipe.id for recipe in recipes]
+
+    def sample(self, population, count, exclude=None):
+        chosen = set()
+        for _ in range(min(count, len(population))):
+            item = self.skewed_choice(population)
+            if item != exclude:
+                chosen.add(item)
+        return chosen
+
+    def create_relations(self, users, recipes, options):
+        if not recipes:
+            return
+        follows, favorites, carts = [], [], []
+        for user in users:
+            follows.extend(
+                Follow(user_id=user, author_id=author)
+                for author in self.sample(users, options['follows'], user)
+            )
+            favorites.extend(
+                Favorite(user_id=user, recipe_id=recipe)
+                for recipe in self.sample(recipes, options['favorites'])
+            )
+            carts.extend(
+                ShoppingCart(user_id=user, recipe_id=recipe)
+                for recipe in self.sample(recipes, options['cart'])
+            )
+        for model, objects in (
+            (Follow, follows), (Favorite, favorites), (ShoppingCart, carts)
+        ):
+            model.objects.bulk_create(
+                objects, batch_size=self.batch_size, ignore_conflicts=True
+            )
+            self.stdout.write(f'{model.__name__}: {len(objects)}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Создаём уменьшенные копии изображений рецептов."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать варианты для всех рецептов')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_thumbnail='')
+        processed = failed = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            try:
+                generate_variants(recipe_id)
+                processed += 1
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f'Recipe {recipe_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Image variants generated: {processed}, failed: {failed}'
+        ))
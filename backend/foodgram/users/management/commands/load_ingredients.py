@@ -1,34 +1,105 @@
 import csv
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from foodgram.versions import INGREDIENTS_VERSION, bump_version
 from recipes.models import Ingredient
 
 DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+BATCH_SIZE = 1000
+CREATE_SQL = '''
+CREATE TEMP TABLE ingredient_import (
+    name varchar(200),
+    measurement_unit varchar(32)
+) ON COMMIT DROP
+'''
+COPY_SQL = 'COPY ingredient_import FROM STDIN WITH (FORMAT csv)'
+INSERT_SQL = '''
+INSERT INTO {table} (name, measurement_unit)
+SELECT DISTINCT name, measurement_unit FROM ingredient_import
+ON CONFLICT DO NOTHING
+'''
 
 
 class Command(BaseCommand):
-    """Добавляем ингредиенты из файла CSV."""
+    """Добавляем ингредиенты из файла CSV или JSON."""
 
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.csv',
                             nargs='?', type=str)
+        parser.add_argument('--format', choices=('csv', 'json'),
+                            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--batch-size', default=BATCH_SIZE, type=int)
+        parser.add_argument('--copy', action='store_true',
+                            help='Загрузка через COPY (только PostgreSQL)')
 
     def handle(self, *args, **options):
-        print(DATA_ROOT)
+        path = os.path.join(DATA_ROOT, options['filename'])
+        file_format = options['format'] or (
+            'json' if path.endswith('.json') else 'csv'
+        )
+        before = Ingredient.objects.count()
+        self.started = time.monotonic()
         try:
-            with open(os.path.join(DATA_ROOT, options['filename']),
-                      'r', encoding='utf-8') as f:
-                data = csv.reader(f)
-                for row in data:
-                    name, measurement_unit = row
-                    Ingredient.objects.get_or_create(
-                        name=name, measurement_unit=measurement_unit
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                if options['copy']:
+                    self.copy(f, file_format)
+                else:
+                    rows = (
+                        self.read_json(f) if file_format == 'json'
+                        else csv.reader(f)
                     )
-                self.stdout.write(
-                    self.style.SUCCESS('Ingredients uploaded')
-                )
+                    self.bulk_insert(rows, options['batch_size'])
         except FileNotFoundError:
-            raise CommandError('Add ingredients.csv to data')
+            raise CommandError(f'Add {options["filename"]} to data')
+        bump_version(INGREDIENTS_VERSION)
+        created = Ingredient.objects.count() - before
+        self.stdout.write(
+            self.style.SUCCESS(f'Ingredients uploaded: {created} new')
+        )
+
+    def read_json(self, f):
+        for item in json.load(f):
+            yield item['name'], item['measurement_unit']
+
+    def bulk_insert(self, rows, batch_size):
+        rows = iter(rows)
+        processed = 0
+        while True:
+            chunk = [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in islice(rows, batch_size)
+            ]
+            if not chunk:
+                break
+            Ingredient.objects.bulk_create(chunk, ignore_conflicts=True)
+            processed += len(chunk)
+            self.report(processed)
+
+    def copy(self, f, file_format):
+        if connection.vendor != 'postgresql':
+            raise CommandError('--copy is supported only on PostgreSQL')
+        if file_format != 'csv':
+            raise CommandError('--copy is supported only for CSV files')
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(CREATE_SQL)
+            cursor.copy_expert(COPY_SQL, f)
+            cursor.execute('SELECT count(*) FROM ingredient_import')
+            processed = cursor.fetchone()[0]
+            cursor.execute(
+                INSERT_SQL.format(table=Ingredient._meta.db_table)
+            )
+            self.report(processed)
+
+    def report(self, processed):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'Processed {processed} rows '
+            f'({processed / max(elapsed, 1e-6):.0f} rows/sec)'
+        )
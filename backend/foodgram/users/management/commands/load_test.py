@@ -0,0 +1,99 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_api import percentile
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=6&page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=мол',
+)
+
+
+class Command(BaseCommand):
+    """Нагружаем запущенный сервер параллельными HTTP-запросами.
+
+    Команда нужна для сравнения развёртываний: один и тот же прогон
+    выполняется против gunicorn с WSGI и против uvicorn с ASGI, а
+    результат (req/s, p50/p95/p99) сохраняется и сравнивается.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='Например http://localhost:8000')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Путь запроса, можно несколько')
+        parser.add_argument('--concurrency', default=50, type=int)
+        parser.add_argument('--requests', default=1000, type=int,
+                            help='Всего запросов')
+        parser.add_argument('--token', help='Токен для авторизации')
+        parser.add_argument('--timeout', default=30, type=float)
+        parser.add_argument('--save', help='Сохранить результат в файл')
+        parser.add_argument('--compare', help='Файл прогона для сравнения')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        urls = [
+            options['base_url'].rstrip('/') + quote(
+                paths[number % len(paths)], safe='/?&=%'
+            )
+            for number in range(options['requests'])
+        ]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(
+                lambda url: self.fetch(url, headers, options['timeout']),
+                urls,
+            ))
+        total = time.perf_counter() - started
+        timings = [duration for duration, _ in results]
+        errors = sum(1 for _, status in results if status >= 400)
+        result = {
+            'concurrency': options['concurrency'],
+            'requests': len(results),
+            'errors': errors,
+            'rps': round(len(results) / total, 1),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+        }
+        for key, value in result.items():
+            self.stdout.write(f'{key:12} {value}')
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(result, f, indent=2)
+        if options['compare']:
+            self.compare(result, options['compare'])
+
+    def fetch(self, url, headers, timeout):
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers),
+                         timeout=timeout) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            status = error.code
+        except (URLError, OSError) as error:
+            raise CommandError(f'{url}: {error}')
+        return time.perf_counter() - started, status
+
+    def compare(self, result, path):
+        with open(path) as f:
+            base = json.load(f)
+        for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            change = (result[key] - base[key]) / base[key] * 100 if (
+                base[key]) else 0
+            self.stdout.write(
+                f'{key:12} {base[key]:>10} -> {result[key]:<10} '
+                f'({change:+.1f}%)'
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import feed
+
+
+class Command(BaseCommand):
+    """Пересобираем ленты подписок из таблицы подписок.
+
+    Нужна после изменения FEED_FANOUT_LIMIT или FEED_BACKFILL_SIZE и если
+    ленты разошлись с подписками.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', type=int,
+                            dest='users', help='id пользователя')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = feed.rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Feed entries: {rows}'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    """Пересобираем списки покупок из корзин пользователей.
+
+    Нужна, если списки разошлись с корзинами, например после правок
+    через админку или напрямую в базе.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', type=int,
+                            dest='users', help='id пользователя')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = shopping_list.rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Shopping list items: {rows}'
+        ))
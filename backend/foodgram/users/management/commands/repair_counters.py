@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import repair_counters
+
+
+class Command(BaseCommand):
+    """Пересчитываем счётчики избранного, корзин, рецептов и подписчиков.
+
+    Каждый счётчик исправляется одним UPDATE с подзапросом, и только в
+    строках, где сохранённое значение расходится с реальным.
+    """
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = repair_counters()
+        for counter, rows in fixed.items():
+            self.stdout.write(f'{counter}: fixed {rows}')
+        self.stdout.write(self.style.SUCCESS('Counters are consistent'))
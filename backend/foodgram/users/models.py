@@ -20,6 +20,16 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=150)
     last_name = models.CharField(max_length=150)
     email = models.EmailField(max_length=254, unique=True)
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        editable=False,
+    )
     REQUIRED_FIELDS = ('email', 'first_name', 'last_name')
 
     class Meta:
@@ -48,6 +58,12 @@ class Follow(models.Model):
                 name='unique_follow',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user} подписан на {self.author}'
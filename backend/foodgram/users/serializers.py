@@ -38,6 +38,8 @@ class UserGetSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, data):
+        if hasattr(data, 'is_subscribed'):
+            return data.is_subscribed
         return Follow.objects.filter(
             user=self.context['request'].user.id,
             author=data.id,
@@ -57,7 +59,7 @@ class RecipeUserSubscriptionSerializer(serializers.ModelSerializer):
 
 class SubscriptionListSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
     recipes = serializers.SerializerMethodField()
 
     class Meta(UserSerializer.Meta):
@@ -73,10 +75,15 @@ class SubscriptionListSerializer(UserSerializer):
         )
 
     def get_recipes(self, data):
-        recipes_limit = self.context['request'].GET.get('recipes_limit', '')
-        query = Recipe.objects.filter(author=data.id)
-        if recipes_limit != '':
-            query = query[:int(recipes_limit)]
+        if hasattr(data, 'subscription_recipes'):
+            query = data.subscription_recipes
+        else:
+            recipes_limit = self.context['request'].GET.get(
+                'recipes_limit', ''
+            )
+            query = Recipe.objects.filter(author=data.id)
+            if recipes_limit.isdigit():
+                query = query[:int(recipes_limit)]
         serializer = RecipeUserSubscriptionSerializer(
             query,
             many=True
@@ -84,10 +91,9 @@ class SubscriptionListSerializer(UserSerializer):
         return serializer.data
 
     def get_is_subscribed(self, data):
+        if hasattr(data, 'is_subscribed'):
+            return data.is_subscribed
         return Follow.objects.filter(
             user=self.context['request'].user.id,
             author=data.id,
         ).exists()
-
-    def get_recipes_count(self, data):
-        return Recipe.objects.filter(author=data.id).count()